@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import platform
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+# 被测脚本按同目录模块互相导入，这里把 scripts/ 放到最前（spawn 子进程会继承 sys.path）。
+_SCRIPTS_DIR = str(Path(__file__).resolve().parent.parent)
+if _SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, _SCRIPTS_DIR)
+
+from bench.cases import CASES, prepare, run_case  # noqa: E402
+
+ROW_SIZES = "1000,10000,100000,500000"
+PAGE_SIZES = "10,100"
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=str(Path(__file__).resolve().parent),
+            capture_output=True,
+            text=True,
+            timeout=10,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    return out.stdout.strip()
+
+
+def _sizes(spec: str) -> list[int]:
+    return [int(x) for x in spec.split(",") if x.strip()]
+
+
+def _print_delta(results: list[dict[str, Any]], baseline_path: Path) -> None:
+    # 与另一次运行（通常是另一个提交）的 JSON 对比，按 (用例, 规模) 打印耗时倍率。
+    old = json.loads(baseline_path.read_text(encoding="utf-8"))
+    old_map = {(r["case"], r["size"]): r for r in old.get("results", [])}
+    for r in results:
+        prev = old_map.get((r["case"], r["size"]))
+        if prev is None or not prev.get("seconds"):
+            continue
+        ratio = r["seconds"] / prev["seconds"]
+        print(
+            f"{r['case']}[{r['size']}]: {prev['seconds']:.3f}s -> {r['seconds']:.3f}s (x{ratio:.2f})",
+            file=sys.stderr,
+        )
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="量程比对/提取脚本的基准测试：合成数据，逐用例独立子进程，输出 JSON。")
+    p.add_argument("--cases", default=",".join(CASES), help=f"逗号分隔的用例（可选：{','.join(CASES)}）")
+    p.add_argument("--sizes", default=ROW_SIZES, help="工作簿类用例的行数列表")
+    p.add_argument("--pdf-pages", default=PAGE_SIZES, help="PDF 类用例的页数列表")
+    p.add_argument(
+        "--workdir",
+        default=str(Path(tempfile.gettempdir()) / "range_check_bench"),
+        help="合成数据与输出目录（已生成的数据会复用）",
+    )
+    p.add_argument("--out", default="", help="JSON 结果文件（默认输出到标准输出）")
+    p.add_argument("--baseline", default="", help="上一次的 JSON 结果，打印耗时对比")
+    args = p.parse_args(argv)
+
+    workdir = Path(args.workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    for c in cases:
+        if c not in CASES:
+            p.error(f"未知用例：{c}")
+
+    plan: list[tuple[str, int]] = []
+    for c in cases:
+        sizes = _sizes(args.sizes) if CASES[c][1] == "rows" else _sizes(args.pdf_pages)
+        plan.extend((c, n) for n in sizes)
+
+    results: list[dict[str, Any]] = []
+    ctx = mp.get_context("spawn")
+    for case, size in plan:
+        print(f"[bench] {case} size={size}", file=sys.stderr)
+        prepare(case, workdir, size)
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as ex:
+            results.append(ex.submit(run_case, case, str(workdir), size).result())
+
+    report = {
+        "meta": {
+            "git_commit": _git_commit(),
+            "started": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    if args.baseline:
+        _print_delta(results, Path(args.baseline))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
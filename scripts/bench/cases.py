@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import sys
+import time
+from contextlib import contextmanager, redirect_stdout
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from bench import synth
+from memory_usage import peak_rss
+
+
+class Stages:
+    def __init__(self) -> None:
+        self.totals: dict[str, dict[str, float]] = {}
+
+    @contextmanager
+    def __call__(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            st = self.totals.setdefault(name, {"seconds": 0.0, "count": 0})
+            st["seconds"] += time.perf_counter() - t0
+            st["count"] += 1
+
+
+# 每个用例返回 (处理单位数, 单位名)；耗时按阶段记入 stages。数据生成在计时之外完成。
+
+
+def case_compare(workdir: Path, size: int, stages: Stages) -> tuple[int, str]:
+    # 与 compare_and_mark 相同的步骤逐段计时：加载比对表 -> 加载基准 -> 表头/位号索引 -> 比对着色 -> 保存。
+    import openpyxl
+
+    import compare_range_check_excel as cmp
+
+    base_path, compare_path = synth.range_workbooks(workdir, size)
+    out_path = workdir / "out" / f"compare_{size}.xlsx"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with stages("excel_load_compare"):
+        compare_map, _, _ = cmp._load_compare_map(compare_path, None)
+    with stages("excel_load_base"):
+        wb = openpyxl.load_workbook(str(base_path))
+    try:
+        ws = wb[wb.sheetnames[0]]
+        with stages("header_detect"):
+            headers = cmp._find_headers(ws)
+            base_rows = cmp._index_base_rows(ws, headers)
+            col_fuzzy = cmp._prepare_output_columns(ws, headers)
+        with stages("compare"):
+            cmp._mark_rows(ws, headers, base_rows, compare_map, col_fuzzy)
+        with stages("save"):
+            wb.save(str(out_path))
+    finally:
+        wb.close()
+    return size, "rows"
+
+
+def case_compare_report(workdir: Path, size: int, stages: Stages) -> tuple[int, str]:
+    import compare_range_check_excel as cmp
+
+    base_path, compare_path = synth.range_workbooks(workdir, size)
+    with stages("compare_report"):
+        cmp.compare_report(base_path, compare_path, out_dir=workdir / "out", report_format="csv")
+    return size, "rows"
+
+
+def case_dcs_xlsx(workdir: Path, size: int, stages: Stages) -> tuple[int, str]:
+    import extract_dcs_fields as dcs
+
+    path = synth.dcs_sheet(workdir, size)
+    with stages("excel_extract"):
+        dcs._extract_from_xlsx(path)
+    return size, "rows"
+
+
+def case_pdf_tables(workdir: Path, pages: int, stages: Stages) -> tuple[int, str]:
+    import pdfplumber
+
+    from extract_folder_range_check import _pick_main_table
+
+    path = synth.ruled_table_pdf(workdir, pages)
+    with stages("pdf_open"):
+        pdf = pdfplumber.open(str(path))
+    try:
+        for page in pdf.pages:
+            with stages("find_tables"):
+                _pick_main_table(page)
+    finally:
+        pdf.close()
+    return pages, "pages"
+
+
+def case_pdf_tables_reuse(workdir: Path, pages: int, stages: Stages) -> tuple[int, str]:
+    # 同上，但同布局页复用表格几何（_TableGeometryCache），与 pdf_tables 对比即为 find_tables 的节省。
+    import pdfplumber
+
+    from extract_folder_range_check import _TableGeometryCache, _pick_main_table
+
+    path = synth.ruled_table_pdf(workdir, pages)
+    with stages("pdf_open"):
+        pdf = pdfplumber.open(str(path))
+    try:
+        geometry = _TableGeometryCache()
+        for page in pdf.pages:
+            with stages("pick_table"):
+                _pick_main_table(page, geometry)
+    finally:
+        pdf.close()
+    return pages, "pages"
+
+
+def case_dcs_pdf(workdir: Path, pages: int, stages: Stages) -> tuple[int, str]:
+    import extract_dcs_fields as dcs
+
+    path = synth.ruled_table_pdf(workdir, pages)
+    with stages("pdf_extract"):
+        dcs._extract_from_pdf(path)
+    return pages, "pages"
+
+
+def case_ocr_replay(workdir: Path, pages: int, stages: Stages) -> tuple[int, str]:
+    # 回放录制的词框：单独计时单元格分配（_CellTextIndex），再跑一遍完整的扫描件提取流程（fixture 后端）。
+    import pdfplumber
+
+    import extract_folder_range_check as folder
+    from ocr_backends import get_backend
+
+    resolution = 180
+    path = synth.ruled_table_pdf(workdir, pages)
+    fixture_dir = synth.ocr_fixture(workdir, path, resolution)
+    backend = get_backend("fixture", str(fixture_dir))
+    scale = resolution / 72.0
+
+    with pdfplumber.open(str(path)) as pdf:
+        for i, page in enumerate(pdf.pages):
+            table = folder._pick_main_table(page)
+            if table is None:
+                continue
+            rows = [r.bbox for r in table.rows]
+            cols = [c.bbox for c in table.columns]
+            words = backend.words_for_page(path, i, page, resolution)
+            with stages("cell_assign"):
+                cells = folder._CellTextIndex(words, rows, cols, scale)
+                for r_idx in range(len(rows)):
+                    for c_idx in range(len(cols)):
+                        cells.text(r_idx, c_idx)
+
+    with stages("scanned_extract"):
+        folder._extract_from_pdf_scanned(
+            path,
+            resolution=resolution,
+            ocr_backend="fixture",
+            ocr_fixtures=str(fixture_dir),
+            text_layer="off",
+        )
+    return pages, "pages"
+
+
+CASES: dict[str, tuple[Callable[[Path, int, Stages], tuple[int, str]], str]] = {
+    "compare": (case_compare, "rows"),
+    "compare_report": (case_compare_report, "rows"),
+    "dcs_xlsx": (case_dcs_xlsx, "rows"),
+    "pdf_tables": (case_pdf_tables, "pages"),
+    "pdf_tables_reuse": (case_pdf_tables_reuse, "pages"),
+    "dcs_pdf": (case_dcs_pdf, "pages"),
+    "ocr_replay": (case_ocr_replay, "pages"),
+}
+
+
+def prepare(case: str, workdir: Path, size: int) -> None:
+    # 在计时子进程之外预先生成数据。
+    if CASES[case][1] == "rows":
+        if case == "dcs_xlsx":
+            synth.dcs_sheet(workdir, size)
+        else:
+            synth.range_workbooks(workdir, size)
+    else:
+        path = synth.ruled_table_pdf(workdir, size)
+        if case == "ocr_replay":
+            synth.ocr_fixture(workdir, path, 180)
+
+
+def run_case(case: str, workdir: str, size: int) -> dict[str, Any]:
+    # 在独立子进程中执行，峰值 RSS 只反映该用例。
+    fn, _ = CASES[case]
+    stages = Stages()
+    t0 = time.perf_counter()
+    # 被测函数自己的打印（如 compare_report 的汇总）转到 stderr，stdout 只留给基准结果 JSON。
+    with redirect_stdout(sys.stderr):
+        units, unit_name = fn(Path(workdir), size, stages)
+    seconds = time.perf_counter() - t0
+    return {
+        "case": case,
+        "size": size,
+        "unit": unit_name,
+        "seconds": round(seconds, 6),
+        "throughput": round(units / seconds, 3) if seconds > 0 else None,
+        "throughput_unit": f"{unit_name}/s",
+        "peak_rss_bytes": peak_rss(),
+        "stages": {k: {"seconds": round(v["seconds"], 6), "count": int(v["count"])} for k, v in stages.totals.items()},
+    }
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+# 冷启动检查：导入各脚本时不得加载重依赖（只能在实际处理文件的函数内导入），并测量 --help 的墙钟时间。
+# 用法：python -m bench.startup [--budget-ms 300]；有脚本违规、导入失败或超出预算时退出码为 1。
+# CI（.github/workflows/scripts-startup.yml）在 scripts/ 有改动时运行；预算留有余量，本机实测约 70–120 ms。
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+SCRIPTS = ("compare_range_check_excel", "extract_dcs_fields", "extract_folder_range_check", "range_check_client")
+HEAVY_MODULES = ("openpyxl", "pdfplumber", "pdfminer", "numpy", "PIL", "pypdfium2", "pyarrow", "winrt", "asyncio")
+
+
+DEFAULT_BUDGET_MS = 300.0
+
+
+def heavy_imports(module: str) -> tuple[list[str], int, str]:
+    # 返回 (导入该模块时加载的重依赖顶层包, 导入总耗时 µs, 导入失败时的错误行)，依据 python -X importtime 的输出。
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=str(SCRIPTS_DIR),
+        capture_output=True,
+        text=True,
+    )
+    error = ""
+    if proc.returncode != 0:
+        lines = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+        error = lines[-1] if lines else f"exit {proc.returncode}"
+    loaded: set[str] = set()
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line.split("|")
+        name = parts[-1].strip()
+        top = name.split(".")[0]
+        if top in HEAVY_MODULES:
+            loaded.add(top)
+        if name == module:
+            total_us = int(parts[1].strip())
+    return sorted(loaded), total_us, error
+
+
+def help_seconds(module: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run(
+            [sys.executable, str(SCRIPTS_DIR / f"{module}.py"), "--help"],
+            cwd=str(SCRIPTS_DIR),
+            capture_output=True,
+            check=True,
+        )
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="检查各脚本的导入开销与 --help 冷启动时间。")
+    p.add_argument("--repeat", type=int, default=5, help="--help 计时重复次数（取最小值）")
+    p.add_argument(
+        "--budget-ms",
+        type=float,
+        default=DEFAULT_BUDGET_MS,
+        help=f"--help 冷启动时间上限（毫秒，默认 {DEFAULT_BUDGET_MS:g}；0=只报告）",
+    )
+    args = p.parse_args(argv)
+
+    results: list[dict[str, Any]] = []
+    failed = False
+    for module in SCRIPTS:
+        heavy, import_us, error = heavy_imports(module)
+        seconds = help_seconds(module, max(1, args.repeat)) if not error else 0.0
+        over = args.budget_ms > 0 and seconds * 1000 > args.budget_ms
+        failed = failed or bool(heavy) or bool(error) or over
+        results.append(
+            {
+                "script": module,
+                "import_ms": round(import_us / 1000, 3),
+                "help_ms": round(seconds * 1000, 3),
+                "heavy_imports": heavy,
+                "import_error": error,
+                "over_budget": over,
+            }
+        )
+    print(json.dumps({"python": sys.version.split()[0], "results": results}, ensure_ascii=False, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
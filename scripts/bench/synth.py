@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import random
+from pathlib import Path
+from typing import Optional
+
+import openpyxl
+
+# 生成基准测试用的合成数据：量程比对工作簿、DCS 兜底表、带表格线的 PDF。
+# 同一 (类型, 规模, seed) 生成的内容固定，文件已存在时直接复用，生成耗时不计入测试。
+
+_TAG_CODES = ["PT", "PI", "TE", "TI", "LT", "LI", "FT", "VE"]
+_UNITS = ["MPa", "kPa", "℃", "%", "m3/h", "mm/s"]
+_RANGES = [(0, 2.5), (0, 1.6), (-100, 100), (0, 100), (0, 400), (0, 25)]
+
+
+def tag_for(i: int) -> str:
+    return f"{10 + i % 90}{_TAG_CODES[i % len(_TAG_CODES)]}-{1000 + i}"
+
+
+def _write_sheet(path: Path, title: str, header: list[str], rows: list[list[object]], lead: Optional[list] = None) -> Path:
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    for r in lead or []:
+        ws.append(r)
+    ws.append(header)
+    for r in rows:
+        ws.append(r)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    wb.save(str(path))
+    return path
+
+
+def range_workbooks(out_dir: Path, rows: int, seed: int = 0) -> tuple[Path, Path]:
+    # 基准表（Sheet“基准”）与比对表（Sheet“数据”）：约 8% 量程不一致、3% 仅基准、3% 仅比对，
+    # 另有少量位号按 OCR 常见形式损坏（O/0、缺连字符），覆盖模糊匹配路径。
+    base_path = out_dir / f"range_base_{rows}_{seed}.xlsx"
+    cmp_path = out_dir / f"range_cmp_{rows}_{seed}.xlsx"
+    if base_path.exists() and cmp_path.exists():
+        return base_path, cmp_path
+
+    rnd = random.Random(seed)
+    base_rows: list[list[object]] = []
+    cmp_rows: list[list[object]] = []
+    for i in range(rows):
+        tag = tag_for(i)
+        low, high = _RANGES[i % len(_RANGES)]
+        base_rows.append([i + 1, tag, f"测点{i}", low, high])
+        roll = rnd.random()
+        if roll < 0.03:
+            continue
+        cmp_tag = tag
+        if roll < 0.04:
+            cmp_tag = tag.replace("-", "").replace("0", "O", 1)
+        cmp_low, cmp_high = low, high
+        if rnd.random() < 0.08:
+            cmp_high = high * 2
+        cmp_rows.append([cmp_tag, None, str(cmp_low), cmp_high])
+    for j in range(max(1, rows * 3 // 100)):
+        cmp_rows.append([tag_for(rows + j), None, 0, 1])
+    rnd.shuffle(cmp_rows)
+
+    _write_sheet(base_path, "基准", ["序号", "位号", "描述", "量程下限", "量程上限"], base_rows)
+    _write_sheet(cmp_path, "数据", ["Tag", "x", "LRV", "URV"], cmp_rows)
+    return base_path, cmp_path
+
+
+def dcs_sheet(out_dir: Path, rows: int, seed: int = 0) -> Path:
+    # DCS 兜底表：标题行 + 空行后才是表头，目标列不在最前面，约 2% 重复位号。
+    path = out_dir / f"dcs_{rows}_{seed}.xlsx"
+    if path.exists():
+        return path
+    rnd = random.Random(seed)
+    data: list[list[object]] = []
+    for i in range(rows):
+        k = rnd.randrange(rows) if rnd.random() < 0.02 else i
+        low, high = _RANGES[k % len(_RANGES)]
+        data.append([i + 1, tag_for(k), f"回路{k}", f"泵出口压力{k}", f"{low}~{high}", _UNITS[k % len(_UNITS)], ""])
+    header = ["序号", "仪表位号", "回路", "用途", "测量范围", "工程单位", "备注"]
+    return _write_sheet(path, "Sheet1", header, data, lead=[["DCS 数据表"], []])
+
+
+# ---- PDF ----
+# 手写最小 PDF：STSong-Light（Adobe-GB1，UniGB-UCS2-H 编码，不嵌入字体），与常见 CJK 报表 PDF 结构一致，
+# 文本层可被 pdfplumber 解析，表格线用于 find_tables 的 lines 策略。
+
+PDF_HEADERS = ["序号", "仪表位号", "用途", "测量范围", "工程单位", "备注", "其它", "X"]
+_PAGE_W, _PAGE_H = 842, 595
+
+
+def _ucs2(text: str) -> str:
+    return "".join(f"{ord(ch):04X}" for ch in text)
+
+
+def _page_content(page: int, rows_per_page: int, seed: int) -> bytes:
+    x0, y0, cw, rh = 30, 560, 95, 20
+    cols = len(PDF_HEADERS)
+    n = rows_per_page + 1
+    ops: list[str] = ["0.5 w"]
+    for i in range(n + 1):
+        ops.append(f"{x0} {y0 - i * rh} m {x0 + cw * cols} {y0 - i * rh} l S")
+    for j in range(cols + 1):
+        ops.append(f"{x0 + j * cw} {y0} m {x0 + j * cw} {y0 - n * rh} l S")
+    for i in range(n):
+        if i == 0:
+            texts = PDF_HEADERS
+        else:
+            k = page * rows_per_page + i - 1
+            low, high = _RANGES[k % len(_RANGES)]
+            texts = [str(k + 1), tag_for(k + seed * 1_000_000), f"泵出口压力{k}", f"{low}~{high}", _UNITS[k % 6], "", "", ""]
+        for j, t in enumerate(texts):
+            if t:
+                ops.append(f"BT /F1 9 Tf {x0 + j * cw + 3} {y0 - i * rh - 14} Td <{_ucs2(t)}> Tj ET")
+    return "\n".join(ops).encode("ascii")
+
+
+def ruled_table_pdf(out_dir: Path, pages: int, rows_per_page: int = 25, seed: int = 0) -> Path:
+    path = out_dir / f"ruled_{pages}x{rows_per_page}_{seed}.pdf"
+    if path.exists():
+        return path
+
+    objects: list[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")
+    pages_obj = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type0 /BaseFont /STSong-Light /Encoding /UniGB-UCS2-H /DescendantFonts [4 0 R] >>")
+    add(
+        b"<< /Type /Font /Subtype /CIDFontType0 /BaseFont /STSong-Light"
+        b" /CIDSystemInfo << /Registry (Adobe) /Ordering (GB1) /Supplement 2 >>"
+        b" /FontDescriptor 5 0 R /DW 1000 /W [1 95 500] >>"
+    )
+    add(
+        b"<< /Type /FontDescriptor /FontName /STSong-Light /Flags 6 /FontBBox [-25 -254 1000 880]"
+        b" /ItalicAngle 0 /Ascent 880 /Descent -120 /CapHeight 880 /StemV 93 >>"
+    )
+    kids: list[int] = []
+    for p in range(pages):
+        content = _page_content(p, rows_per_page, seed)
+        stream = add(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        kids.append(
+            add(
+                b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R"
+                b" /Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_obj, _PAGE_W, _PAGE_H, stream, font)
+            )
+        )
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_obj
+    objects[pages_obj - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids),
+        len(kids),
+    )
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets: list[int] = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(bytes(out))
+    return path
+
+
+def ocr_fixture(out_dir: Path, pdf_path: Path, resolution: int) -> Path:
+    # “录制”OCR 词框：用文本层生成与 OCR 后端同格式的词框 JSON，供 fixture 后端回放。
+    import pdfplumber
+
+    from ocr_backends import TextLayerBackend, save_fixture
+
+    fixture_dir = out_dir / f"fixtures_{resolution}"
+    target = fixture_dir / f"{pdf_path.name}.json"
+    if target.exists():
+        return fixture_dir
+    backend = TextLayerBackend()
+    pages: dict[int, list] = {}
+    with pdfplumber.open(str(pdf_path)) as pdf:
+        for i, page in enumerate(pdf.pages):
+            pages[i] = backend.words_for_page(pdf_path, i, page, resolution)
+    save_fixture(fixture_dir, pdf_path, resolution, pages)
+    return fixture_dir
@@ -1,15 +1,27 @@
 from __future__ import annotations
 
 import argparse
+import os
 import re
+import threading
+from collections import OrderedDict
+from contextlib import ExitStack
+from copy import copy
 from dataclasses import dataclass
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from itertools import chain
 from pathlib import Path
-from typing import Any, Iterable, Optional
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Optional
 
-import openpyxl
-from openpyxl.styles import PatternFill
+import profiling
+from header_registry import HeaderRegistry, get_registry, sheet_fingerprint
+from tag_index import TagIndex, TagMatch
+
+# openpyxl/numpy 等较重的依赖只在用到的函数内导入，--help 与参数错误时不付出导入开销。
+if TYPE_CHECKING:
+    from openpyxl.worksheet.worksheet import Worksheet
 
 
 def _norm_tag(v: object) -> str:
@@ -79,6 +91,108 @@ def _format_pair(low: object, high: object) -> str:
     return f"下限={fmt(low)}, 上限={fmt(high)}"
 
 
+@dataclass(frozen=True)
+class Tolerance:
+    # 默认只吸收浮点噪声（与原先的精确比较等价）；更宽的容差须通过 --abs-tol/--rel-tol 显式指定。
+    abs_tol: float = 1e-12
+    rel_tol: float = 1e-12
+
+
+DEFAULT_TOLERANCE = Tolerance()
+
+# 有效数字超过该位数时 float 已不能精确表示，交给 Decimal 判定。
+_FLOAT_SAFE_DIGITS = 15
+
+
+def _decimal_close(a: Decimal, b: Decimal, tol: Tolerance) -> bool:
+    if a.is_nan() or b.is_nan():
+        return False
+    if not (a.is_finite() and b.is_finite()):
+        return a == b
+    limit = max(Decimal(repr(tol.abs_tol)), Decimal(repr(tol.rel_tol)) * max(abs(a), abs(b)))
+    return abs(a - b) <= limit
+
+
+def _values_equal(a: object, b: object, tol: Tolerance = DEFAULT_TOLERANCE) -> bool:
+    a_d = _to_decimal(a)
+    b_d = _to_decimal(b)
+    if a_d is not None and b_d is not None:
+        return _decimal_close(a_d, b_d, tol)
+    return str(a).strip() == str(b).strip()
+
+
+def _parse_column(values: list[object]) -> tuple[list[Optional[Decimal]], list[float], list[bool]]:
+    # 逐值解析一次（相同取值复用结果）：Decimal 原值、float 近似值（不可用时为 nan）、是否需要 Decimal 精确判定。
+    memo: dict[tuple[type, object], tuple[Optional[Decimal], float, bool]] = {}
+    decs: list[Optional[Decimal]] = []
+    floats: list[float] = []
+    exact: list[bool] = []
+    for v in values:
+        try:
+            key = (type(v), v)
+            hit = memo.get(key)
+        except TypeError:
+            key, hit = None, None
+        if hit is None:
+            d = _to_decimal(v)
+            if d is None:
+                hit = (None, float("nan"), False)
+            elif not d.is_finite():
+                hit = (d, float("nan"), True)
+            else:
+                hit = (d, float(d), len(d.as_tuple().digits) > _FLOAT_SAFE_DIGITS)
+            if key is not None:
+                memo[key] = hit
+        decs.append(hit[0])
+        floats.append(hit[1])
+        exact.append(hit[2])
+    return decs, floats, exact
+
+
+def _equal_mask(
+    base_values: list[object],
+    cmp_values: list[object],
+    tol: Tolerance = DEFAULT_TOLERANCE,
+) -> list[bool]:
+    # 列式比较：两侧都能解析为数值的行用 NumPy 一次算出 |a-b| <= max(abs_tol, rel_tol*max(|a|,|b|))；
+    # 落在容差边界附近（浮点误差可能改变结论）或超出 float 精度的行再用 Decimal 精确判定；
+    # 不能解析为数值的行按去空白后的字符串比较，与 _values_equal 结论一致。
+    a_dec, a_f, a_exact = _parse_column(base_values)
+    b_dec, b_f, b_exact = _parse_column(cmp_values)
+    n = len(base_values)
+
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+
+    if np is None:
+        return [_values_equal(base_values[i], cmp_values[i], tol) for i in range(n)]
+
+    a = np.asarray(a_f, dtype=np.float64)
+    b = np.asarray(b_f, dtype=np.float64)
+    both_num = np.fromiter((x is not None and y is not None for x, y in zip(a_dec, b_dec)), bool, n)
+    exact = np.asarray(a_exact, dtype=bool) | np.asarray(b_exact, dtype=bool)
+
+    # inf/nan 参与运算会产生 RuntimeWarning，这些行随后由 ambiguous 交给 Decimal 逐个判定。
+    with np.errstate(invalid="ignore", over="ignore"):
+        mag = np.maximum(np.abs(a), np.abs(b))
+        limit = np.maximum(tol.abs_tol, tol.rel_tol * mag)
+        diff = np.abs(a - b)
+        eq = diff <= limit
+        near = np.abs(diff - limit) <= 8 * np.finfo(np.float64).eps * np.maximum(mag, 1.0)
+    ambiguous = both_num & (exact | near | ~np.isfinite(diff))
+
+    out = eq.tolist()
+    both_list = both_num.tolist()
+    for i in np.flatnonzero(ambiguous).tolist():
+        out[i] = _decimal_close(a_dec[i], b_dec[i], tol)
+    for i in range(n):
+        if not both_list[i]:
+            out[i] = str(base_values[i]).strip() == str(cmp_values[i]).strip()
+    return out
+
+
 @dataclass(frozen=True)
 class HeaderInfo:
     header_row: int
@@ -87,43 +201,109 @@ class HeaderInfo:
     col_high: int
 
 
-def _find_headers(ws: openpyxl.worksheet.worksheet.Worksheet) -> HeaderInfo:
-    tag_keys = {"位号", "tag", "t ag"}
-    low_keys = {"量程下限", "下限", "lrv", "range low", "low range"}
-    high_keys = {"量程上限", "上限", "urv", "range high", "high range"}
+_HEADER_SCAN_ROWS = 20
+_HEADER_SCAN_COLS = 100
+_HEADER_LAYOUT_KIND = "compare"
 
-    def norm_header(x: object) -> str:
-        if x is None:
-            return ""
-        s = str(x).strip().lower()
-        s = re.sub(r"\s+", "", s)
-        return s
 
-    for r in range(1, 21):
-        headers = [norm_header(ws.cell(row=r, column=c).value) for c in range(1, 101)]
-        if all(h == "" for h in headers[:8]):
-            continue
+def _find_headers(
+    ws: Worksheet,
+    registry: Optional[HeaderRegistry] = None,
+) -> HeaderInfo:
+    rows = ws.iter_rows(
+        min_row=1, max_row=_HEADER_SCAN_ROWS, min_col=1, max_col=_HEADER_SCAN_COLS, values_only=True
+    )
+    if registry is None:
+        return _find_headers_in_rows(rows)
+
+    # 以 Sheet 名与第一个非空行作为模板指纹；命中时只校验登记的表头行，不再逐行做关键字匹配。
+    seen: list[tuple] = []
+    fingerprint: Optional[str] = None
+    for r, row in enumerate(rows, start=1):
+        seen.append(row)
+        if any(v is not None and str(v).strip() for v in row):
+            fingerprint = sheet_fingerprint(ws.title, r, row)
+            break
+
+    if fingerprint is not None:
+        layout = registry.get(_HEADER_LAYOUT_KIND, fingerprint)
+        if layout is not None:
+            header_row = int(layout["header_row"])
+            while len(seen) < header_row:
+                nxt = next(rows, None)
+                if nxt is None:
+                    break
+                seen.append(nxt)
+            found = _match_header_row(seen[header_row - 1]) if len(seen) >= header_row else None
+            cached = HeaderInfo(header_row=header_row, **layout["columns"])
+            ok = found is not None and HeaderInfo(header_row, *found) == cached
+            registry.verified(ok)
+            if ok:
+                return cached
+
+    info = _find_headers_in_rows(chain(seen, rows))
+    if fingerprint is not None:
+        registry.put(
+            _HEADER_LAYOUT_KIND,
+            fingerprint,
+            {
+                "header_row": info.header_row,
+                "columns": {"col_tag": info.col_tag, "col_low": info.col_low, "col_high": info.col_high},
+            },
+        )
+    return info
+
+
+_TAG_KEYS = {"位号", "tag", "t ag"}
+_LOW_KEYS = {"量程下限", "下限", "lrv", "range low", "low range"}
+_HIGH_KEYS = {"量程上限", "上限", "urv", "range high", "high range"}
+
+
+def _norm_header(x: object) -> str:
+    if x is None:
+        return ""
+    s = str(x).strip().lower()
+    s = re.sub(r"\s+", "", s)
+    return s
 
-        def find_col(keys: set[str]) -> Optional[int]:
-            for idx, h in enumerate(headers, start=1):
-                if not h:
-                    continue
-                for k in keys:
-                    if k in h:
-                        return idx
-            return None
 
-        col_tag = find_col(tag_keys)
-        col_low = find_col(low_keys)
-        col_high = find_col(high_keys)
-        if col_tag and col_low and col_high:
+def _match_header_row(row: tuple) -> Optional[tuple[int, int, int]]:
+    values = list(row[:_HEADER_SCAN_COLS]) + [None] * (_HEADER_SCAN_COLS - len(row[:_HEADER_SCAN_COLS]))
+    headers = [_norm_header(v) for v in values]
+    if all(h == "" for h in headers[:8]):
+        return None
+
+    def find_col(keys: set[str]) -> Optional[int]:
+        for idx, h in enumerate(headers, start=1):
+            if not h:
+                continue
+            for k in keys:
+                if k in h:
+                    return idx
+        return None
+
+    col_tag = find_col(_TAG_KEYS)
+    col_low = find_col(_LOW_KEYS)
+    col_high = find_col(_HIGH_KEYS)
+    if col_tag and col_low and col_high:
+        return col_tag, col_low, col_high
+    return None
+
+
+def _find_headers_in_rows(rows: Iterable[tuple]) -> HeaderInfo:
+    for r, row in enumerate(rows, start=1):
+        if r > _HEADER_SCAN_ROWS:
+            break
+        found = _match_header_row(row)
+        if found is not None:
+            col_tag, col_low, col_high = found
             return HeaderInfo(header_row=r, col_tag=col_tag, col_low=col_low, col_high=col_high)
 
     raise ValueError("未在前20行内找到表头：需要包含“位号/量程下限/量程上限”列。")
 
 
 def _iter_data_rows(
-    ws: openpyxl.worksheet.worksheet.Worksheet,
+    ws: Worksheet,
     header_row: int,
     col_tag: int,
 ) -> Iterable[int]:
@@ -135,15 +315,85 @@ def _iter_data_rows(
         yield r
 
 
+CompareMap = tuple[dict[str, tuple[object, object]], HeaderInfo, str]
+
+
+class _WorkbookCache:
+    # 进程内的比对表解析结果缓存（常驻服务模式启用）：键为 (路径, 大小, mtime, Sheet 名)，文件改写后自动失效；LRU 淘汰。
+    # 缓存的映射只读共享，调用方不得修改。
+    def __init__(self, max_entries: int) -> None:
+        self._max = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, CompareMap]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> Optional[CompareMap]:
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return hit
+
+    def put(self, key: tuple, value: CompareMap) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_workbook_cache: Optional[_WorkbookCache] = None
+
+
+def enable_workbook_cache(max_entries: int = 16) -> _WorkbookCache:
+    global _workbook_cache
+    if _workbook_cache is None:
+        _workbook_cache = _WorkbookCache(max_entries)
+    return _workbook_cache
+
+
 def _load_compare_map(
     xlsx_path: Path,
     sheet_name: Optional[str],
-) -> tuple[dict[str, tuple[object, object]], HeaderInfo, str]:
-    wb = openpyxl.load_workbook(str(xlsx_path), read_only=True, data_only=True)
+    header_registry: str = "",
+) -> CompareMap:
+    cache = _workbook_cache
+    if cache is None:
+        return _read_compare_map(xlsx_path, sheet_name, header_registry)
+    st = xlsx_path.stat()
+    key = (str(xlsx_path.resolve()), st.st_size, st.st_mtime_ns, sheet_name or "")
+    hit = cache.get(key)
+    if hit is None:
+        hit = _read_compare_map(xlsx_path, sheet_name, header_registry)
+        cache.put(key, hit)
+    return hit
+
+
+def _read_compare_map(
+    xlsx_path: Path,
+    sheet_name: Optional[str],
+    header_registry: str = "",
+) -> CompareMap:
+    import openpyxl
+
+    with profiling.stage("excel_load"):
+        wb = openpyxl.load_workbook(str(xlsx_path), read_only=True, data_only=True)
     try:
         chosen_name = sheet_name or ("数据" if "数据" in wb.sheetnames else wb.sheetnames[0])
         ws = wb[chosen_name]
-        headers = _find_headers(ws)
+        registry = get_registry(header_registry)
+        with profiling.stage("header_detect"):
+            headers = _find_headers(ws, registry)
+        if registry is not None:
+            registry.save()
 
         m: dict[str, tuple[object, object]] = {}
         max_col = max(headers.col_tag, headers.col_low, headers.col_high)
@@ -169,128 +419,717 @@ def _load_compare_map(
         wb.close()
 
 
+@dataclass(frozen=True)
+class BaseRow:
+    row: int
+    tag: str
+    raw_tag: str
+    low: object
+    high: object
+
+
+_COL_BASE_OUT = 6
+_COL_CMP_OUT = 7
+
+
+@lru_cache(maxsize=None)
+def _fills() -> tuple[Any, Any]:
+    from openpyxl.styles import PatternFill
+
+    return PatternFill("solid", fgColor="C6EFCE"), PatternFill("solid", fgColor="FFC7CE")
+
+
+def _index_base_rows(ws: Worksheet, headers: HeaderInfo) -> list[BaseRow]:
+    rows: list[BaseRow] = []
+    for r in _iter_data_rows(ws, headers.header_row, headers.col_tag):
+        raw = ws.cell(row=r, column=headers.col_tag).value
+        tag = _canon_tag(raw)
+        if tag == "":
+            continue
+        rows.append(
+            BaseRow(
+                row=r,
+                tag=tag,
+                raw_tag=_norm_tag(raw),
+                low=ws.cell(row=r, column=headers.col_low).value,
+                high=ws.cell(row=r, column=headers.col_high).value,
+            )
+        )
+    return rows
+
+
+def _prepare_output_columns(ws: Worksheet, headers: HeaderInfo) -> int:
+    # 返回模糊匹配列：表中已有数据之后的第一个空列，不覆盖用户在基准表右侧的内容。
+    # 表头检测按列探测时会创建空单元格，ws.max_column 偏大，这里只看有值的单元格。
+    last_col = max((col for (_, col), cell in ws._cells.items() if cell.value is not None), default=0)
+    col_fuzzy = max(last_col, _COL_CMP_OUT) + 1
+    ws.cell(row=headers.header_row, column=_COL_BASE_OUT).value = "基准量程(下限/上限)"
+    ws.cell(row=headers.header_row, column=_COL_CMP_OUT).value = "比对量程(下限/上限)"
+
+    header_style_src = ws.cell(row=headers.header_row, column=max(1, headers.col_high))._style
+    ws.cell(row=headers.header_row, column=_COL_BASE_OUT)._style = header_style_src
+    ws.cell(row=headers.header_row, column=_COL_CMP_OUT)._style = header_style_src
+    return col_fuzzy
+
+
+# 默认只做距离 0 的模糊匹配：形近字符（O/0、I/1、S/5）与连字符/下划线差异折叠后相同即可关联；
+# 真实的字符差异（如 FT-1001 与 FT-1002）多半是不同仪表，需显式 --fuzzy-max-dist 才参与关联。
+DEFAULT_FUZZY_MAX_DIST = 0
+
+
+class _FuzzyJoin:
+    # 精确位号未命中时的兜底关联：只在“未被任何基准位号精确命中”的比对位号中做有界编辑距离查找，
+    # 每个比对位号至多被一个基准位号认领，同一基准位号多次出现时复用首次结果。
+    def __init__(
+        self,
+        compare_map: dict[str, tuple[object, object]],
+        exact_tags: set[str],
+        max_dist: int,
+    ) -> None:
+        pool = [t for t in compare_map if t not in exact_tags]
+        self._index = TagIndex(pool, max_dist) if pool else None
+        self._memo: dict[str, Optional[TagMatch]] = {}
+        self.claimed: set[str] = set()
+
+    def match(self, tag: str) -> Optional[TagMatch]:
+        if tag in self._memo:
+            return self._memo[tag]
+        hit: Optional[TagMatch] = None
+        if self._index is not None:
+            for cand in self._index.search(tag):
+                if cand.tag not in self.claimed:
+                    hit = cand
+                    self.claimed.add(cand.tag)
+                    break
+        self._memo[tag] = hit
+        return hit
+
+
+def _format_fuzzy(hit: TagMatch) -> str:
+    return f"{hit.tag}（距离{hit.distance}）"
+
+
+def _mark_rows(
+    ws: Worksheet,
+    headers: HeaderInfo,
+    base_rows: list[BaseRow],
+    compare_map: dict[str, tuple[object, object]],
+    col_fuzzy: int,
+    tol: Tolerance = DEFAULT_TOLERANCE,
+    fuzzy_max_dist: Optional[int] = DEFAULT_FUZZY_MAX_DIST,
+) -> tuple[int, int, dict[str, str], dict[str, TagMatch]]:
+    green_fill, red_fill = _fills()
+    mismatches = 0
+    matched = 0
+    status: dict[str, str] = {}
+    fuzzy_hits: dict[str, TagMatch] = {}
+
+    fuzzy: Optional[_FuzzyJoin] = None
+    if fuzzy_max_dist is not None:
+        exact_tags = {row.tag for row in base_rows if row.tag in compare_map}
+        fuzzy = _FuzzyJoin(compare_map, exact_tags, fuzzy_max_dist)
+
+    joined: list[tuple[BaseRow, tuple[object, object], Optional[TagMatch]]] = []
+    for row in base_rows:
+        cmp_pair = compare_map.get(row.tag)
+        hit: Optional[TagMatch] = None
+        if cmp_pair is None and fuzzy is not None:
+            hit = fuzzy.match(row.tag)
+            if hit is not None:
+                cmp_pair = compare_map[hit.tag]
+                fuzzy_hits[row.tag] = hit
+        if cmp_pair is not None:
+            joined.append((row, cmp_pair, hit))
+
+    low_mask = _equal_mask([row.low for row, _, _ in joined], [pair[0] for _, pair, _ in joined], tol)
+    high_mask = _equal_mask([row.high for row, _, _ in joined], [pair[1] for _, pair, _ in joined], tol)
+
+    if fuzzy_hits:
+        header = ws.cell(row=headers.header_row, column=col_fuzzy)
+        header.value = "模糊匹配位号(编辑距离)"
+        header._style = copy(ws.cell(row=headers.header_row, column=_COL_CMP_OUT)._style)
+
+    for (row, cmp_pair, hit), low_equal, high_equal in zip(joined, low_mask, high_mask):
+        r = row.row
+        base_low = row.low
+        base_high = row.high
+        cmp_low, cmp_high = cmp_pair
+
+        matched += 1
+        if hit is not None:
+            ws.cell(row=r, column=col_fuzzy).value = _format_fuzzy(hit)
+
+        if low_equal and high_equal:
+            ws.cell(row=r, column=headers.col_low).fill = green_fill
+            ws.cell(row=r, column=headers.col_high).fill = green_fill
+            ws.cell(row=r, column=_COL_BASE_OUT).value = None
+            ws.cell(row=r, column=_COL_CMP_OUT).value = None
+            status.setdefault(row.tag, "一致")
+            continue
+
+        if low_equal:
+            ws.cell(row=r, column=headers.col_low).fill = green_fill
+        else:
+            ws.cell(row=r, column=headers.col_low).fill = red_fill
+        if high_equal:
+            ws.cell(row=r, column=headers.col_high).fill = green_fill
+        else:
+            ws.cell(row=r, column=headers.col_high).fill = red_fill
+
+        ws.cell(row=r, column=_COL_BASE_OUT).value = _format_pair(base_low, base_high)
+        ws.cell(row=r, column=_COL_CMP_OUT).value = _format_pair(cmp_low, cmp_high)
+        mismatches += 1
+        status[row.tag] = "不一致"
+
+    return matched, mismatches, status, fuzzy_hits
+
+
 def compare_and_mark(
     base_path: Path,
     compare_path: Path,
     out_dir: Optional[Path] = None,
     base_sheet: Optional[str] = None,
     compare_sheet: Optional[str] = None,
+    tolerance: Tolerance = DEFAULT_TOLERANCE,
+    fuzzy_max_dist: Optional[int] = DEFAULT_FUZZY_MAX_DIST,
+    header_registry: str = "",
 ) -> Path:
+    import openpyxl
+
     if not base_path.exists():
         raise FileNotFoundError(f"基准文件不存在：{base_path}")
     if not compare_path.exists():
         raise FileNotFoundError(f"比对文件不存在：{compare_path}")
 
-    compare_map, _, chosen_compare_sheet = _load_compare_map(compare_path, compare_sheet)
+    compare_map, _, chosen_compare_sheet = _load_compare_map(compare_path, compare_sheet, header_registry)
 
-    wb = openpyxl.load_workbook(str(base_path))
+    with profiling.stage("excel_load"):
+        wb = openpyxl.load_workbook(str(base_path))
     try:
         chosen_base_sheet = base_sheet or wb.sheetnames[0]
         ws = wb[chosen_base_sheet]
-        headers = _find_headers(ws)
+        registry = get_registry(header_registry)
+        with profiling.stage("header_detect"):
+            headers = _find_headers(ws, registry)
+        if registry is not None:
+            registry.save()
+        base_rows = _index_base_rows(ws, headers)
+        col_fuzzy = _prepare_output_columns(ws, headers)
 
-        green_fill = PatternFill("solid", fgColor="C6EFCE")
-        red_fill = PatternFill("solid", fgColor="FFC7CE")
+        with profiling.stage("compare"):
+            matched, mismatches, _, fuzzy_hits = _mark_rows(
+                ws, headers, base_rows, compare_map, col_fuzzy, tolerance, fuzzy_max_dist
+            )
 
-        col_base_out = 6
-        col_cmp_out = 7
-        ws.cell(row=headers.header_row, column=col_base_out).value = "基准量程(下限/上限)"
-        ws.cell(row=headers.header_row, column=col_cmp_out).value = "比对量程(下限/上限)"
+        out_dir2 = out_dir or base_path.parent
+        out_dir2.mkdir(parents=True, exist_ok=True)
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        out_path = out_dir2 / f"{base_path.stem}_比对结果_{ts}{base_path.suffix}"
+        with profiling.stage("save"):
+            wb.save(str(out_path))
 
-        header_style_src = ws.cell(row=headers.header_row, column=max(1, headers.col_high))._style
-        ws.cell(row=headers.header_row, column=col_base_out)._style = header_style_src
-        ws.cell(row=headers.header_row, column=col_cmp_out)._style = header_style_src
+        print(
+            f"完成：基准Sheet={chosen_base_sheet}；比对Sheet={chosen_compare_sheet}；"
+            f"位号匹配={matched}；模糊匹配={len(fuzzy_hits)}；不一致={mismatches}；输出={out_path}"
+        )
+        return out_path
+    finally:
+        wb.close()
 
-        mismatches = 0
-        matched = 0
 
-        for r in _iter_data_rows(ws, headers.header_row, headers.col_tag):
-            tag = _canon_tag(ws.cell(row=r, column=headers.col_tag).value)
-            if tag == "":
-                continue
+def _discover_compare_files(specs: list[str]) -> list[Path]:
+    paths: list[Path] = []
+    for spec in specs:
+        p = Path(spec)
+        if p.is_dir():
+            paths.extend(
+                sorted(x for x in p.glob("*.xlsx") if not x.name.startswith("~$"))
+            )
+        else:
+            paths.append(p)
+    return paths
 
-            cmp_pair = compare_map.get(tag)
-            if cmp_pair is None:
-                continue
 
-            base_low = ws.cell(row=r, column=headers.col_low).value
-            base_high = ws.cell(row=r, column=headers.col_high).value
-            cmp_low, cmp_high = cmp_pair
+def _source_names(paths: list[Path]) -> list[str]:
+    names: list[str] = []
+    used: dict[str, int] = {}
+    for p in paths:
+        n = used.get(p.stem, 0) + 1
+        used[p.stem] = n
+        names.append(p.stem if n == 1 else f"{p.stem}_{n}")
+    return names
 
-            base_low_d = _to_decimal(base_low)
-            base_high_d = _to_decimal(base_high)
-            cmp_low_d = _to_decimal(cmp_low)
-            cmp_high_d = _to_decimal(cmp_high)
 
-            low_equal = (base_low_d == cmp_low_d) if (base_low_d is not None and cmp_low_d is not None) else (
-                str(base_low).strip() == str(cmp_low).strip()
-            )
-            high_equal = (base_high_d == cmp_high_d) if (base_high_d is not None and cmp_high_d is not None) else (
-                str(base_high).strip() == str(cmp_high).strip()
-            )
+def _write_summary_matrix(
+    out_path: Path,
+    base_rows: list[BaseRow],
+    sources: list[str],
+    statuses: list[dict[str, str]],
+    compare_maps: list[dict[str, tuple[object, object]]],
+    claimed: list[set[str]],
+) -> None:
+    # claimed：各来源中已被基准位号模糊认领的比对位号，不再作为“仅比对”列出。
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
 
-            matched += 1
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("汇总")
+    ws.freeze_panes = "B2"
 
-            if low_equal and high_equal:
-                ws.cell(row=r, column=headers.col_low).fill = green_fill
-                ws.cell(row=r, column=headers.col_high).fill = green_fill
-                ws.cell(row=r, column=col_base_out).value = None
-                ws.cell(row=r, column=col_cmp_out).value = None
-                continue
+    green_fill, red_fill = _fills()
+    fills = {"一致": green_fill, "不一致": red_fill}
+    styles: dict[str, Any] = {}
+    for status, fill in fills.items():
+        tpl = WriteOnlyCell(ws)
+        tpl.fill = fill
+        styles[status] = tpl._style
 
-            if low_equal:
-                ws.cell(row=r, column=headers.col_low).fill = green_fill
-            else:
-                ws.cell(row=r, column=headers.col_low).fill = red_fill
-            if high_equal:
-                ws.cell(row=r, column=headers.col_high).fill = green_fill
+    def cell(status: str) -> Any:
+        c = WriteOnlyCell(ws, status or None)
+        if status in styles:
+            c._style = copy(styles[status])
+        return c
+
+    ws.append(["位号"] + sources)
+    seen: set[str] = set()
+    for row in base_rows:
+        if row.tag in seen:
+            continue
+        seen.add(row.tag)
+        ws.append([row.raw_tag] + [cell(st.get(row.tag, "")) for st in statuses])
+
+    extra: list[str] = []
+    for m, c in zip(compare_maps, claimed):
+        for tag in m:
+            if tag not in seen and tag not in c:
+                seen.add(tag)
+                extra.append(tag)
+    for tag in extra:
+        ws.append(
+            [tag] + [cell("仅比对" if tag in m and tag not in c else "") for m, c in zip(compare_maps, claimed)]
+        )
+
+    wb.save(str(out_path))
+
+
+def compare_many(
+    base_path: Path,
+    compare_paths: list[Path],
+    out_dir: Optional[Path] = None,
+    base_sheet: Optional[str] = None,
+    compare_sheet: Optional[str] = None,
+    workers: int = 0,
+    tolerance: Tolerance = DEFAULT_TOLERANCE,
+    fuzzy_max_dist: Optional[int] = DEFAULT_FUZZY_MAX_DIST,
+    header_registry: str = "",
+) -> list[Path]:
+    # 一份基准对多份比对文件：基准只加载、定位表头、规范化位号一次；
+    # 比对文件在进程池中并行 _load_compare_map，逐个着色输出后把基准恢复原状再处理下一份。
+    from concurrent.futures import ProcessPoolExecutor
+
+    import openpyxl
+
+    if not base_path.exists():
+        raise FileNotFoundError(f"基准文件不存在：{base_path}")
+    for p in compare_paths:
+        if not p.exists():
+            raise FileNotFoundError(f"比对文件不存在：{p}")
+
+    out_dir2 = out_dir or base_path.parent
+    out_dir2.mkdir(parents=True, exist_ok=True)
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    sources = _source_names(compare_paths)
+
+    max_workers = workers or min(len(compare_paths), os.cpu_count() or 1)
+    outputs: list[Path] = []
+    statuses: list[dict[str, str]] = []
+    compare_maps: list[dict[str, tuple[object, object]]] = []
+    claimed: list[set[str]] = []
+
+    with profiling.stage("excel_load"):
+        wb = openpyxl.load_workbook(str(base_path))
+    try:
+        chosen_base_sheet = base_sheet or wb.sheetnames[0]
+        ws = wb[chosen_base_sheet]
+        registry = get_registry(header_registry)
+        with profiling.stage("header_detect"):
+            headers = _find_headers(ws, registry)
+        if registry is not None:
+            registry.save()
+        base_rows = _index_base_rows(ws, headers)
+        col_fuzzy = _prepare_output_columns(ws, headers)
+
+        snapshot_cols = (headers.col_low, headers.col_high, _COL_BASE_OUT, _COL_CMP_OUT, col_fuzzy)
+        snapshot: dict[int, list[tuple[Any, object]]] = {}
+        for r in [headers.header_row] + [row.row for row in base_rows]:
+            cells = [ws.cell(row=r, column=c) for c in snapshot_cols]
+            snapshot[r] = [(copy(c._style), c.value) for c in cells]
+
+        with ExitStack() as stack:
+            loaded_args = (compare_paths, [compare_sheet] * len(compare_paths), [header_registry] * len(compare_paths))
+            if _workbook_cache is not None:
+                # 启用了进程内缓存（常驻服务）时直接在本进程取用已解析的比对表，不再分发到子进程重新解析。
+                loaded: Iterable[CompareMap] = map(_load_compare_map, *loaded_args)
             else:
-                ws.cell(row=r, column=headers.col_high).fill = red_fill
+                ex = stack.enter_context(ProcessPoolExecutor(max_workers=max(1, max_workers)))
+                loaded = ex.map(_load_compare_map, *loaded_args)
+            for compare_path, source, (compare_map, _, chosen_compare_sheet) in zip(
+                compare_paths, sources, loaded
+            ):
+                with profiling.stage("compare"):
+                    matched, mismatches, status, fuzzy_hits = _mark_rows(
+                        ws, headers, base_rows, compare_map, col_fuzzy, tolerance, fuzzy_max_dist
+                    )
+                out_path = out_dir2 / f"{base_path.stem}_比对结果_{source}_{ts}{base_path.suffix}"
+                with profiling.stage("save"):
+                    wb.save(str(out_path))
+                outputs.append(out_path)
+                statuses.append(status)
+                compare_maps.append(compare_map)
+                claimed.append({hit.tag for hit in fuzzy_hits.values()})
+                print(
+                    f"完成：基准Sheet={chosen_base_sheet}；比对文件={compare_path.name}；"
+                    f"比对Sheet={chosen_compare_sheet}；位号匹配={matched}；模糊匹配={len(fuzzy_hits)}；"
+                    f"不一致={mismatches}；输出={out_path}"
+                )
+
+                for r, saved in snapshot.items():
+                    for c, (style, value) in zip(snapshot_cols, saved):
+                        cell = ws.cell(row=r, column=c)
+                        cell._style = copy(style)
+                        cell.value = value
+    finally:
+        wb.close()
 
-            ws.cell(row=r, column=col_base_out).value = _format_pair(base_low, base_high)
-            ws.cell(row=r, column=col_cmp_out).value = _format_pair(cmp_low, cmp_high)
-            mismatches += 1
+    summary_path = out_dir2 / f"{base_path.stem}_比对汇总_{ts}.xlsx"
+    with profiling.stage("save"):
+        _write_summary_matrix(summary_path, base_rows, sources, statuses, compare_maps, claimed)
+    print(f"汇总：比对文件数={len(compare_paths)}；输出={summary_path}")
+    outputs.append(summary_path)
+    return outputs
 
-        out_dir2 = out_dir or base_path.parent
-        out_dir2.mkdir(parents=True, exist_ok=True)
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        out_path = out_dir2 / f"{base_path.stem}_比对结果_{ts}{base_path.suffix}"
+
+REPORT_HEADERS = ["位号", "状态", "基准行号", "基准下限", "基准上限", "比对下限", "比对上限", "模糊匹配位号", "编辑距离"]
+
+
+def _report_writer(out_path: Path) -> tuple[Any, Any]:
+    if out_path.suffix.lower() == ".csv":
+        import csv
+
+        f = out_path.open("w", encoding="utf-8-sig", newline="")
+        w = csv.writer(f)
+        return w.writerow, f.close
+
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("差异")
+    ws.freeze_panes = "A2"
+
+    def close() -> None:
         wb.save(str(out_path))
 
-        print(
-            f"完成：基准Sheet={chosen_base_sheet}；比对Sheet={chosen_compare_sheet}；"
-            f"位号匹配={matched}；不一致={mismatches}；输出={out_path}"
-        )
-        return out_path
+    return ws.append, close
+
+
+# 基准报告行：(行号, 规范化位号, 原始位号, 下限, 上限)
+BaseEntry = tuple[int, str, object, object, object]
+
+
+def _iter_base_entries(ws: Any, headers: HeaderInfo) -> Iterator[BaseEntry]:
+    max_col = max(headers.col_tag, headers.col_low, headers.col_high)
+    for r, row in enumerate(
+        ws.iter_rows(min_row=headers.header_row + 1, max_col=max_col, values_only=True),
+        start=headers.header_row + 1,
+    ):
+        if not row:
+            continue
+        tag_raw = row[headers.col_tag - 1] if headers.col_tag - 1 < len(row) else None
+        tag = _canon_tag(tag_raw)
+        if tag == "":
+            continue
+        low = row[headers.col_low - 1] if headers.col_low - 1 < len(row) else None
+        high = row[headers.col_high - 1] if headers.col_high - 1 < len(row) else None
+        yield r, tag, tag_raw, low, high
+
+
+def _write_report(
+    out_path: Path,
+    entries: Iterable[BaseEntry],
+    compare_map: dict[str, tuple[object, object]],
+    tolerance: Tolerance,
+    fuzzy_max_dist: Optional[int],
+) -> tuple[int, int, int, int, int]:
+    # 返回 (位号匹配, 模糊匹配, 不一致, 仅基准, 仅比对)。
+    # 启用模糊匹配时，精确未命中的基准行先暂存，全表扫描完（已知全部精确命中位号）后再模糊关联。
+    write_row, close = _report_writer(out_path)
+    try:
+        write_row(REPORT_HEADERS)
+        # 流式读取基准行与比对/写出交织进行，整体计为 compare。
+        with profiling.stage("compare"):
+            matched = 0
+            mismatches = 0
+            base_only = 0
+            fuzzy_matched = 0
+            seen: set[str] = set()
+            pending: list[BaseEntry] = []
+            for r, tag, tag_raw, base_low, base_high in entries:
+                cmp_pair = compare_map.get(tag)
+                if cmp_pair is None:
+                    if fuzzy_max_dist is not None:
+                        pending.append((r, tag, tag_raw, base_low, base_high))
+                        continue
+                    base_only += 1
+                    write_row([_norm_tag(tag_raw), "仅基准", r, base_low, base_high, None, None, None, None])
+                    continue
+
+                seen.add(tag)
+                matched += 1
+                cmp_low, cmp_high = cmp_pair
+                if _values_equal(base_low, cmp_low, tolerance) and _values_equal(base_high, cmp_high, tolerance):
+                    continue
+                mismatches += 1
+                write_row([_norm_tag(tag_raw), "不一致", r, base_low, base_high, cmp_low, cmp_high, None, None])
+
+            if pending:
+                fuzzy = _FuzzyJoin(compare_map, seen, fuzzy_max_dist)
+                for r, tag, tag_raw, base_low, base_high in pending:
+                    hit = fuzzy.match(tag)
+                    if hit is None:
+                        base_only += 1
+                        write_row([_norm_tag(tag_raw), "仅基准", r, base_low, base_high, None, None, None, None])
+                        continue
+                    matched += 1
+                    fuzzy_matched += 1
+                    cmp_low, cmp_high = compare_map[hit.tag]
+                    equal = _values_equal(base_low, cmp_low, tolerance) and _values_equal(
+                        base_high, cmp_high, tolerance
+                    )
+                    if not equal:
+                        mismatches += 1
+                    write_row(
+                        [
+                            _norm_tag(tag_raw),
+                            "模糊一致" if equal else "不一致",
+                            r,
+                            base_low,
+                            base_high,
+                            cmp_low,
+                            cmp_high,
+                            hit.tag,
+                            hit.distance,
+                        ]
+                    )
+                seen.update(fuzzy.claimed)
+
+            compare_only = 0
+            for tag, (cmp_low, cmp_high) in compare_map.items():
+                if tag in seen:
+                    continue
+                compare_only += 1
+                write_row([tag, "仅比对", None, None, None, cmp_low, cmp_high, None, None])
+    finally:
+        with profiling.stage("save"):
+            close()
+    return matched, fuzzy_matched, mismatches, base_only, compare_only
+
+
+def compare_reports(
+    base_path: Path,
+    compare_paths: list[Path],
+    out_dir: Optional[Path] = None,
+    base_sheet: Optional[str] = None,
+    compare_sheet: Optional[str] = None,
+    report_format: str = "xlsx",
+    tolerance: Tolerance = DEFAULT_TOLERANCE,
+    fuzzy_max_dist: Optional[int] = DEFAULT_FUZZY_MAX_DIST,
+    header_registry: str = "",
+) -> list[Path]:
+    # 仅输出差异：两份文件均以 read_only 流式读取，按 _canon_tag 哈希关联，
+    # 不加载基准文件样式、不改写基准文件；结果写入单独的 write_only 工作簿或 CSV。
+    # 单个比对文件时基准行边读边比；多个比对文件时基准只读一遍，精简为 BaseEntry 列表后逐份复用，
+    # 报告文件名带上比对来源（同 compare_many），互不覆盖。
+    import openpyxl
+
+    if not base_path.exists():
+        raise FileNotFoundError(f"基准文件不存在：{base_path}")
+    for p in compare_paths:
+        if not p.exists():
+            raise FileNotFoundError(f"比对文件不存在：{p}")
+
+    out_dir2 = out_dir or base_path.parent
+    out_dir2.mkdir(parents=True, exist_ok=True)
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    batch = len(compare_paths) > 1
+    sources = _source_names(compare_paths)
+    outputs: list[Path] = []
+
+    with profiling.stage("excel_load"):
+        wb = openpyxl.load_workbook(str(base_path), read_only=True, data_only=True)
+    try:
+        chosen_base_sheet = base_sheet or wb.sheetnames[0]
+        ws = wb[chosen_base_sheet]
+        registry = get_registry(header_registry)
+        with profiling.stage("header_detect"):
+            headers = _find_headers(ws, registry)
+        if registry is not None:
+            registry.save()
+        entries: Iterable[BaseEntry] = _iter_base_entries(ws, headers)
+        if batch:
+            with profiling.stage("excel_load"):
+                entries = list(entries)
+
+        for compare_path, source in zip(compare_paths, sources):
+            compare_map, _, chosen_compare_sheet = _load_compare_map(compare_path, compare_sheet, header_registry)
+            name = f"{base_path.stem}_差异报告_{source}_{ts}" if batch else f"{base_path.stem}_差异报告_{ts}"
+            out_path = out_dir2 / f"{name}.{report_format}"
+            matched, fuzzy_matched, mismatches, base_only, compare_only = _write_report(
+                out_path, entries, compare_map, tolerance, fuzzy_max_dist
+            )
+            outputs.append(out_path)
+            print(
+                f"完成：基准Sheet={chosen_base_sheet}；"
+                + (f"比对文件={compare_path.name}；" if batch else "")
+                + f"比对Sheet={chosen_compare_sheet}；"
+                f"位号匹配={matched}；模糊匹配={fuzzy_matched}；不一致={mismatches}；"
+                f"仅基准={base_only}；仅比对={compare_only}；输出={out_path}"
+            )
     finally:
         wb.close()
+    return outputs
+
+
+def compare_report(
+    base_path: Path,
+    compare_path: Path,
+    out_dir: Optional[Path] = None,
+    base_sheet: Optional[str] = None,
+    compare_sheet: Optional[str] = None,
+    report_format: str = "xlsx",
+    tolerance: Tolerance = DEFAULT_TOLERANCE,
+    fuzzy_max_dist: Optional[int] = DEFAULT_FUZZY_MAX_DIST,
+    header_registry: str = "",
+) -> Path:
+    return compare_reports(
+        base_path,
+        [compare_path],
+        out_dir,
+        base_sheet,
+        compare_sheet,
+        report_format,
+        tolerance,
+        fuzzy_max_dist,
+        header_registry,
+    )[0]
 
 
 def main(argv: Optional[list[str]] = None) -> int:
     p = argparse.ArgumentParser(description="按位号(Tag)比对两份Excel量程上下限，并对基准文件着色输出。")
     p.add_argument("--base", required=True, help="基准文件路径（xlsx）")
-    p.add_argument("--compare", required=True, help="比对文件路径（xlsx）")
+    p.add_argument(
+        "--compare",
+        required=True,
+        nargs="+",
+        help="比对文件路径（xlsx）；可给多个文件或目录，此时基准只解析一次并额外输出位号×来源汇总表",
+    )
     p.add_argument("--out-dir", default="", help="输出目录（默认：基准文件所在目录）")
     p.add_argument("--base-sheet", default="", help="基准Sheet名（默认：第一个Sheet）")
     p.add_argument("--compare-sheet", default="", help="比对Sheet名（默认：优先“数据”，否则第一个Sheet）")
+    p.add_argument(
+        "--report-only",
+        action="store_true",
+        help="只输出差异报告（不一致/仅基准/仅比对），流式读取且不改写基准文件",
+    )
+    p.add_argument("--report-format", choices=("xlsx", "csv"), default="xlsx", help="差异报告格式")
+    p.add_argument("--workers", type=int, default=0, help="多比对文件时并行加载的进程数（默认：CPU数）")
+    p.add_argument(
+        "--abs-tol",
+        type=float,
+        default=DEFAULT_TOLERANCE.abs_tol,
+        help="数值比较的绝对容差（默认 1e-12；与 --rel-tol 均为 0 时按 Decimal 精确比较）",
+    )
+    p.add_argument(
+        "--rel-tol",
+        type=float,
+        default=DEFAULT_TOLERANCE.rel_tol,
+        help="数值比较的相对容差（默认 1e-12，仅容忍浮点噪声；需要放宽时显式指定）",
+    )
+    p.add_argument(
+        "--fuzzy-max-dist",
+        type=int,
+        default=DEFAULT_FUZZY_MAX_DIST,
+        help="位号精确未命中时模糊匹配的最大编辑距离（O/0、I/1、S/5 混淆与缺失连字符不计入；默认 0，只关联这类差异）",
+    )
+    p.add_argument("--no-fuzzy", action="store_true", help="关闭模糊位号匹配，只按精确位号关联")
+    p.add_argument(
+        "--header-registry",
+        default="",
+        help="表头布局登记文件（默认：输出目录下 .header_layouts.json）；已知模板直接复用表头位置，校验不符时回退完整检测",
+    )
+    p.add_argument("--no-header-registry", action="store_true", help="不使用表头布局登记，每次完整检测表头")
+    profiling.add_argument(p)
     args = p.parse_args(argv)
+    profiling.enable_from_args(args)
 
     out_dir = Path(args.out_dir) if args.out_dir else None
     base_sheet = args.base_sheet or None
     compare_sheet = args.compare_sheet or None
+    tolerance = Tolerance(abs_tol=args.abs_tol, rel_tol=args.rel_tol)
+    fuzzy_max_dist = None if args.no_fuzzy else max(0, args.fuzzy_max_dist)
+    header_registry = ""
+    if not args.no_header_registry:
+        header_registry = args.header_registry or str(
+            (out_dir or Path(args.base).parent) / ".header_layouts.json"
+        )
 
     try:
+        compare_paths = _discover_compare_files(args.compare)
+        if not compare_paths:
+            raise FileNotFoundError(f"未找到比对文件：{' '.join(args.compare)}")
+        batch = len(compare_paths) > 1 or Path(args.compare[0]).is_dir()
+
+        if args.report_only:
+            compare_reports(
+                base_path=Path(args.base),
+                compare_paths=compare_paths,
+                out_dir=out_dir,
+                base_sheet=base_sheet,
+                compare_sheet=compare_sheet,
+                report_format=args.report_format,
+                tolerance=tolerance,
+                fuzzy_max_dist=fuzzy_max_dist,
+                header_registry=header_registry,
+            )
+            return 0
+        if batch:
+            compare_many(
+                base_path=Path(args.base),
+                compare_paths=compare_paths,
+                out_dir=out_dir,
+                base_sheet=base_sheet,
+                compare_sheet=compare_sheet,
+                workers=args.workers,
+                tolerance=tolerance,
+                fuzzy_max_dist=fuzzy_max_dist,
+                header_registry=header_registry,
+            )
+            return 0
         compare_and_mark(
             base_path=Path(args.base),
-            compare_path=Path(args.compare),
+            compare_path=compare_paths[0],
             out_dir=out_dir,
             base_sheet=base_sheet,
             compare_sheet=compare_sheet,
+            tolerance=tolerance,
+            fuzzy_max_dist=fuzzy_max_dist,
+            header_registry=header_registry,
         )
         return 0
     except Exception as e:
         print(f"失败：{type(e).__name__}: {e}")
         return 2
+    finally:
+        profiling.write_from_args(args)
 
 
 if __name__ == "__main__":
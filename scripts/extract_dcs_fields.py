@@ -3,12 +3,18 @@ from __future__ import annotations
 import argparse
 import re
 from dataclasses import dataclass
+from itertools import chain
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
 
-import openpyxl
-import pdfplumber
-from openpyxl.styles import Alignment, Font
+import profiling
+from header_registry import HeaderRegistry, get_registry, sheet_fingerprint
+from memory_usage import peak_rss, released_pages
+from range_check_output import OUTPUT_SUFFIXES, write_records
+
+# pdfplumber/openpyxl 只在对应的提取路径内导入：--help 不付出导入开销，只调用 xlsx 提取时也不加载 pdfplumber。
+if TYPE_CHECKING:
+    from pdfplumber.page import Page
 
 
 def _norm(s: object) -> str:
@@ -66,7 +72,70 @@ def _guess_pdf_in_folder(folder: Path) -> Optional[Path]:
     return pdfs[0] if pdfs else None
 
 
-def _extract_from_pdf(pdf_path: Path) -> list[Record]:
+_TABLE_SETTINGS = {
+    "vertical_strategy": "lines",
+    "horizontal_strategy": "lines",
+    "intersection_tolerance": 5,
+    "snap_tolerance": 3,
+    "join_tolerance": 3,
+    "edge_min_length": 10,
+    "min_words_vertical": 1,
+    "min_words_horizontal": 1,
+}
+
+
+def _page_rows(page: Page) -> Iterable[list[object]]:
+    with profiling.stage("find_tables"):
+        tables = page.extract_tables(_TABLE_SETTINGS)
+    for t in tables or []:
+        for row in t or []:
+            yield row
+
+
+def _row_record(row: list[object], col_map: dict[str, int]) -> Optional[Record]:
+    if not row:
+        return None
+    cells = [_norm_keep_spaces(c) for c in row]
+    cells_norm = [_norm(c) for c in row]
+    if not any(cells_norm):
+        return None
+
+    def get(header: str) -> str:
+        idx = col_map.get(header)
+        if idx is None or idx >= len(cells):
+            return ""
+        return cells[idx].strip()
+
+    instrument_tag = get("仪表位号")
+    if not instrument_tag:
+        return None
+
+    return Record(
+        instrument_tag=instrument_tag,
+        purpose=get("用途"),
+        measure_range=get("测量范围"),
+        unit=get("工程单位"),
+    )
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int, col_map: dict[str, int]) -> list[Record]:
+    import pdfplumber
+
+    records: list[Record] = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in released_pages(pdf.pages[start:stop]):
+            for row in _page_rows(page):
+                rec = _row_record(row, col_map)
+                if rec is not None:
+                    records.append(rec)
+    return records
+
+
+def _extract_from_pdf(pdf_path: Path, workers: int = 1) -> list[Record]:
+    from concurrent.futures import ProcessPoolExecutor
+
+    import pdfplumber
+
     wanted_norm = {k: _norm(k) for k in TARGET_HEADERS.keys()}
     records: list[Record] = []
     seen_header = False
@@ -76,10 +145,9 @@ def _extract_from_pdf(pdf_path: Path) -> list[Record]:
         nonlocal seen_header, col_map, records
         if not row:
             return
-        cells = [_norm_keep_spaces(c) for c in row]
-        cells_norm = [_norm(c) for c in row]
 
         if not seen_header:
+            cells_norm = [_norm(c) for c in row]
             for i, c in enumerate(cells_norm):
                 for header, header_norm in wanted_norm.items():
                     if c == header_norm and header not in col_map:
@@ -88,51 +156,46 @@ def _extract_from_pdf(pdf_path: Path) -> list[Record]:
                 seen_header = True
             return
 
-        if not any(cells_norm):
-            return
-
-        def get(header: str) -> str:
-            idx = col_map.get(header)
-            if idx is None or idx >= len(cells):
-                return ""
-            return cells[idx].strip()
-
-        instrument_tag = get("仪表位号")
-        if not instrument_tag:
-            return
-
-        records.append(
-            Record(
-                instrument_tag=instrument_tag,
-                purpose=get("用途"),
-                measure_range=get("测量范围"),
-                unit=get("工程单位"),
-            )
-        )
-
-    with pdfplumber.open(str(pdf_path)) as pdf:
-        for page in pdf.pages:
-            tables = page.extract_tables(
-                {
-                    "vertical_strategy": "lines",
-                    "horizontal_strategy": "lines",
-                    "intersection_tolerance": 5,
-                    "snap_tolerance": 3,
-                    "join_tolerance": 3,
-                    "edge_min_length": 10,
-                    "min_words_vertical": 1,
-                    "min_words_horizontal": 1,
-                }
-            )
-            for t in tables or []:
-                for row in t or []:
-                    consider_row(row)
+        rec = _row_record(row, col_map)
+        if rec is not None:
+            records.append(rec)
+
+    # 先串行扫描到表头所在页（含该页其余数据行），得到列映射；
+    # 其后的页按连续区间分给多个进程，各自打开 pdfplumber，结果按页序拼接，去重语义与串行一致。
+    next_page = 0
+    with profiling.stage("pdf_open"):
+        pdf_file = pdfplumber.open(str(pdf_path))
+    with pdf_file as pdf:
+        page_count = len(pdf.pages)
+        for page in released_pages(pdf.pages):
+            for row in _page_rows(page):
+                consider_row(row)
 
             if not seen_header:
                 text = page.extract_text() or ""
                 if all(h in text for h in TARGET_HEADERS.keys()):
                     pass
 
+            next_page += 1
+            if seen_header and workers > 1:
+                break
+
+    remaining = page_count - next_page
+    if seen_header and workers > 1 and remaining > 0:
+        chunk = max(1, -(-remaining // (workers * 4)))
+        bounds = [(a, min(a + chunk, page_count)) for a in range(next_page, page_count, chunk)]
+        # 子进程内的阶段不单独计时，父进程整体记为 pdf_workers。
+        with profiling.stage("pdf_workers"), ProcessPoolExecutor(max_workers=workers) as ex:
+            parts = ex.map(
+                _extract_page_range,
+                [str(pdf_path)] * len(bounds),
+                [a for a, _ in bounds],
+                [b for _, b in bounds],
+                [dict(col_map)] * len(bounds),
+            )
+            for part in parts:
+                records.extend(part)
+
     dedup: dict[str, Record] = {}
     for r in records:
         k = _norm(r.instrument_tag)
@@ -141,93 +204,127 @@ def _extract_from_pdf(pdf_path: Path) -> list[Record]:
     return list(dedup.values())
 
 
-def _extract_from_xlsx(xlsx_path: Path) -> list[Record]:
-    wb = openpyxl.load_workbook(str(xlsx_path), data_only=True)
-    ws = wb.active
+_XLSX_HEADER_ROWS = 80
+_XLSX_HEADER_COLS = 80
+_HEADER_LAYOUT_KIND = "dcs_xlsx"
 
-    header_row_idx: Optional[int] = None
-    col_idx: dict[str, int] = {}
-    wanted = list(TARGET_HEADERS.keys())
 
-    max_scan_rows = min(ws.max_row, 80)
-    max_scan_cols = min(ws.max_column, 80)
+def _match_xlsx_header(row_vals: tuple) -> dict[str, int]:
+    wanted = [(header, _norm(header)) for header in TARGET_HEADERS.keys()]
+    tmp: dict[str, int] = {}
+    for i, v in enumerate(row_vals[:_XLSX_HEADER_COLS], start=1):
+        cell = _norm(v)
+        for header, header_norm in wanted:
+            if cell == header_norm:
+                tmp[header] = i
+    return tmp
 
-    for r in range(1, max_scan_rows + 1):
-        row_vals = [ws.cell(row=r, column=c).value for c in range(1, max_scan_cols + 1)]
-        row_norm = [_norm(v) for v in row_vals]
-        tmp: dict[str, int] = {}
-        for i, cell in enumerate(row_norm, start=1):
-            for header in wanted:
-                if cell == _norm(header):
-                    tmp[header] = i
-        if len(tmp) == 4:
-            header_row_idx = r
-            col_idx = tmp
-            break
-
-    if header_row_idx is None:
-        raise RuntimeError(f"未在 {xlsx_path} 中找到包含四个目标字段的表头行。")
 
-    records: list[Record] = []
-    for r in range(header_row_idx + 1, ws.max_row + 1):
-        instrument = _norm_keep_spaces(ws.cell(row=r, column=col_idx["仪表位号"]).value)
-        if not instrument:
-            continue
-        records.append(
-            Record(
+def _find_xlsx_header(rows: Iterator[tuple]) -> tuple[int, dict[str, int]]:
+    for r, row_vals in enumerate(rows, start=1):
+        if r > _XLSX_HEADER_ROWS:
+            break
+        tmp = _match_xlsx_header(row_vals)
+        if len(tmp) == 4:
+            return r, tmp
+    return 0, {}
+
+
+def _iter_xlsx_records(xlsx_path: Path, registry: Optional[HeaderRegistry] = None) -> Iterator[Record]:
+    # read_only 流式读取：前 80 行内找表头（每行只看前 80 列），之后逐行产出记录，内存占用与表大小无关。
+    # 给出 registry 时先按第一个非空行取模板指纹，命中则只校验登记的表头行，不符再完整检测。
+    import openpyxl
+
+    with profiling.stage("excel_load"):
+        wb = openpyxl.load_workbook(str(xlsx_path), read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        # 部分导出工具写入的 dimension 不准，重置后按实际内容迭代，避免截断行/列。
+        ws.reset_dimensions()
+
+        rows: Iterator[tuple] = ws.iter_rows(values_only=True)
+        col_idx: dict[str, int] = {}
+        fingerprint: Optional[str] = None
+        if registry is not None:
+            head: list[tuple] = []
+            for row_vals in rows:
+                head.append(row_vals)
+                if any(_norm(v) for v in row_vals[:_XLSX_HEADER_COLS]):
+                    fingerprint = sheet_fingerprint(ws.title, len(head), row_vals[:_XLSX_HEADER_COLS])
+                    break
+                if len(head) >= _XLSX_HEADER_ROWS:
+                    break
+            layout = registry.get(_HEADER_LAYOUT_KIND, fingerprint) if fingerprint else None
+            if layout is not None:
+                header_row = int(layout["header_row"])
+                while len(head) < header_row:
+                    row_vals = next(rows, None)
+                    if row_vals is None:
+                        break
+                    head.append(row_vals)
+                ok = len(head) == header_row and _match_xlsx_header(head[-1]) == layout["columns"]
+                registry.verified(ok)
+                if ok:
+                    col_idx = dict(layout["columns"])
+            if not col_idx:
+                rows = chain(head, rows)
+
+        if not col_idx:
+            with profiling.stage("header_detect"):
+                header_row, col_idx = _find_xlsx_header(rows)
+            if col_idx and registry is not None and fingerprint is not None:
+                registry.put(_HEADER_LAYOUT_KIND, fingerprint, {"header_row": header_row, "columns": col_idx})
+                registry.save()
+
+        if not col_idx:
+            raise RuntimeError(f"未在 {xlsx_path} 中找到包含四个目标字段的表头行。")
+
+        def get(row_vals: tuple, header: str) -> str:
+            i = col_idx[header] - 1
+            return _norm_keep_spaces(row_vals[i] if i < len(row_vals) else None)
+
+        for row_vals in rows:
+            instrument = get(row_vals, "仪表位号")
+            if not instrument:
+                continue
+            yield Record(
                 instrument_tag=instrument,
-                purpose=_norm_keep_spaces(ws.cell(row=r, column=col_idx["用途"]).value),
-                measure_range=_norm_keep_spaces(ws.cell(row=r, column=col_idx["测量范围"]).value),
-                unit=_norm_keep_spaces(ws.cell(row=r, column=col_idx["工程单位"]).value),
+                purpose=get(row_vals, "用途"),
+                measure_range=get(row_vals, "测量范围"),
+                unit=get(row_vals, "工程单位"),
             )
-        )
+    finally:
+        wb.close()
 
+
+def _extract_from_xlsx(xlsx_path: Path, header_registry: str = "") -> list[Record]:
     dedup: dict[str, Record] = {}
-    for r in records:
+    for r in _iter_xlsx_records(xlsx_path, get_registry(header_registry)):
         k = _norm(r.instrument_tag)
         if k and k not in dedup:
             dedup[k] = r
     return list(dedup.values())
 
 
-def _write_excel(out_path: Path, records: Iterable[Record]) -> None:
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "提取结果"
-
-    headers = ["仪表位号", "用途", "测量范围", "工程单位"]
-    ws.append(headers)
-
-    for r in records:
-        ws.append([r.instrument_tag, r.purpose, r.measure_range, r.unit])
-
-    header_font = Font(bold=True)
-    for c in range(1, 5):
-        cell = ws.cell(row=1, column=c)
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-
-    ws.freeze_panes = "A2"
-    ws.auto_filter.ref = f"A1:D{ws.max_row}"
-
-    widths = [18, 24, 24, 12]
-    for i, w in enumerate(widths, start=1):
-        ws.column_dimensions[openpyxl.utils.get_column_letter(i)].width = w
-
-    for row in ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=1, max_col=4):
-        for cell in row:
-            cell.alignment = Alignment(vertical="top", wrap_text=True)
-
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    wb.save(str(out_path))
-
-
-def main() -> None:
+def main(argv: Optional[list[str]] = None) -> None:
     ap = argparse.ArgumentParser()
     ap.add_argument("--pdf", type=str, required=True)
     ap.add_argument("--xlsx_fallback", type=str, default="")
-    ap.add_argument("--out", type=str, required=True)
-    args = ap.parse_args()
+    ap.add_argument("--out", type=str, required=True, help=f"输出文件，按扩展名选择格式：{'/'.join(OUTPUT_SUFFIXES)}")
+    ap.add_argument("--workers", type=int, default=1, help="PDF按页分片并行提取的进程数（1=串行）")
+    ap.add_argument(
+        "--header-registry",
+        type=str,
+        default="",
+        help="表头布局登记文件（默认：输出目录下 .header_layouts.json）；已知模板直接复用表头位置",
+    )
+    ap.add_argument("--no-header-registry", action="store_true", help="不使用表头布局登记")
+    profiling.add_argument(ap)
+    args = ap.parse_args(argv)
+    # 输出格式在开始任何 OCR 之前检查；否则要等全部处理完才在写出时报错（watch 模式下会直接退出守护循环）。
+    if Path(args.out).suffix.lower() not in OUTPUT_SUFFIXES:
+        ap.error(f"--out 不支持的输出格式：{Path(args.out).suffix or '（无扩展名）'}（可选：{', '.join(OUTPUT_SUFFIXES)}）")
+    profiling.enable_from_args(args)
 
     pdf_path = Path(args.pdf)
     pdf_path2 = _find_existing_path(pdf_path)
@@ -237,7 +334,7 @@ def main() -> None:
             raise FileNotFoundError(f"未找到PDF：{pdf_path}")
         pdf_path2 = guessed
 
-    pdf_records = _extract_from_pdf(pdf_path2)
+    pdf_records = _extract_from_pdf(pdf_path2, workers=args.workers)
     pdf_map = {_norm(r.instrument_tag): r for r in pdf_records if _norm(r.instrument_tag)}
 
     xlsx_records: list[Record] = []
@@ -247,7 +344,10 @@ def main() -> None:
         xlsx_path = Path(args.xlsx_fallback)
         xlsx_path2 = _find_existing_path(xlsx_path) or xlsx_path
         if xlsx_path2.exists():
-            xlsx_records = _extract_from_xlsx(xlsx_path2)
+            header_registry = ""
+            if not args.no_header_registry:
+                header_registry = args.header_registry or str(Path(args.out).parent / ".header_layouts.json")
+            xlsx_records = _extract_from_xlsx(xlsx_path2, header_registry)
             xlsx_map = {_norm(r.instrument_tag): r for r in xlsx_records if _norm(r.instrument_tag)}
 
     if not pdf_map and not xlsx_map:
@@ -274,7 +374,8 @@ def main() -> None:
         )
 
     records_sorted = sorted(merged.values(), key=lambda r: _norm(r.instrument_tag))
-    _write_excel(Path(args.out), records_sorted)
+    with profiling.stage("save"):
+        write_records(Path(args.out), records_sorted, widths=[18, 24, 24, 12])
 
     overlap = set(pdf_map) & set(xlsx_map)
     mismatch = 0
@@ -298,6 +399,8 @@ def main() -> None:
     print(f"overlap_rows={len(overlap)}")
     print(f"overlap_with_any_nonempty_field_mismatch={mismatch}")
     print(f"rows_with_missing_any_field_after_merge={missing_any}")
+    print(f"peak_rss_mb={(peak_rss() or 0) / (1024 * 1024):.1f}")
+    profiling.write_from_args(args)
 
 
 if __name__ == "__main__":
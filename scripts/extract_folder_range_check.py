@@ -1,19 +1,41 @@
 from __future__ import annotations
 
 import argparse
-import asyncio
+import bisect
+import gc
 import io
+import math
+import os
+import queue
 import re
-from dataclasses import dataclass
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import astuple, dataclass, field
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Optional
 
-import openpyxl
-import pdfplumber
-from openpyxl.styles import Alignment, Font
-from winrt.windows.graphics.imaging import BitmapDecoder
-from winrt.windows.media.ocr import OcrEngine
-from winrt.windows.storage.streams import InMemoryRandomAccessStream, DataWriter
+import profiling
+from header_registry import close_registries, get_registry, table_fingerprint
+from memory_usage import current_rss, peak_rss, released_pages
+from ocr_backends import (
+    OCR_BACKENDS,
+    GrayBitmap,
+    OcrBackend,
+    Word,
+    fixture_digest,
+    get_backend,
+    save_fixture,
+)
+from ocr_cache import OcrCache, close_caches, file_sha256, get_cache, page_key
+from range_check_output import OUTPUT_SUFFIXES, write_records
+from run_manifest import RunManifest, file_stat, params_signature
+
+# pdfplumber、PIL、pypdfium2、winrt 都在实际处理 PDF 的函数内导入，--help 与参数校验不付出导入开销。
+if TYPE_CHECKING:
+    from pdfplumber.page import Page
 
 
 def _norm(s: object) -> str:
@@ -40,61 +62,444 @@ class Record:
 TARGET_HEADERS = ["仪表位号", "用途", "测量范围", "工程单位"]
 
 
-def _write_excel(out_path: Path, records: Iterable[Record]) -> None:
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "提取结果"
+_PIPELINE_END = object()
+
+CROP_MODES = ("none", "table", "columns")
+RASTER_MODES = ("png", "gray", "binary")
+
+# 列条带在拼接图中的间隔（像素）与裁剪时列边界的外扩（pt），避免切断跨边界的字形。
+_STRIP_GAP_PX = 8
+_STRIP_PAD_PT = 2.0
+
+
+@dataclass
+class _PageJob:
+    page_index: int
+    row_boxes: list[tuple]
+    col_boxes: list[tuple]
+    payload: Any
+    cache_key: Optional[str] = None
+    # 裁剪渲染时每个条带的 (拼接图x起点, 拼接图x终点, 页面x偏移px, 页面y偏移px)
+    strips: Optional[list[tuple[float, float, float, float]]] = None
+    # 文本层可用的页直接携带 table.extract() 的单元格文本，不经过 OCR。
+    cell_texts: Optional[list[list[Optional[str]]]] = None
+    words: list[Word] = field(default_factory=list)
+
+    @property
+    def path(self) -> str:
+        return "text" if self.cell_texts is not None else "ocr"
+
+
+TEXT_LAYER_MODES = ("auto", "off")
+
+
+def _table_char_count(page: Any, bbox: tuple) -> int:
+    x0, top, x1, bottom = bbox
+    n = 0
+    for ch in page.chars:
+        if x0 <= ch["x0"] and ch["x1"] <= x1 and top <= ch["top"] and ch["bottom"] <= bottom:
+            if not ch["text"].isspace():
+                n += 1
+    return n
+
+
+def _text_layer_cells(
+    page: Any,
+    table: Any,
+    min_chars: int,
+    text_state: dict[str, bool],
+) -> Optional[list[list[Optional[str]]]]:
+    # 主表区域内文本层字符足够，且本页或本文件此前的文本页已出现四个目标表头，才视为可用文本层；
+    # 扫描仪附带的低质量OCR文本层通常凑不齐表头，仍走OCR。
+    if _table_char_count(page, table.bbox) < min_chars:
+        return None
+    with profiling.stage("text_layer"):
+        grid = table.extract()
+    if not text_state.get("headers_seen"):
+        joined = "".join(_clean_ocr_text(c or "") for row in grid for c in row)
+        if not all(h in joined for h in TARGET_HEADERS):
+            return None
+        text_state["headers_seen"] = True
+    return grid
 
-    ws.append(["仪表位号", "用途", "测量范围", "工程单位"])
-    for r in records:
-        ws.append([r.instrument_tag, r.purpose, r.measure_range, r.unit])
 
-    header_font = Font(bold=True)
-    for c in range(1, 5):
-        cell = ws.cell(row=1, column=c)
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+def _render_crop(
+    page: Any,
+    bboxes: list[tuple],
+    resolution: int,
+) -> tuple[Any, list[tuple[float, float, float, float]]]:
+    from PIL import Image
 
-    ws.freeze_panes = "A2"
-    ws.auto_filter.ref = f"A1:D{ws.max_row}"
+    scale = resolution / 72.0
+    images = [page.crop(bbox).to_image(resolution=resolution).original for bbox in bboxes]
+    if len(images) == 1:
+        bbox = bboxes[0]
+        return images[0], [(0.0, float(images[0].width), bbox[0] * scale, bbox[1] * scale)]
 
-    widths = [18, 28, 26, 12]
-    for i, w in enumerate(widths, start=1):
-        ws.column_dimensions[openpyxl.utils.get_column_letter(i)].width = w
+    width = sum(im.width for im in images) + _STRIP_GAP_PX * (len(images) - 1)
+    height = max(im.height for im in images)
+    canvas = Image.new(images[0].mode, (width, height), "white")
+    strips: list[tuple[float, float, float, float]] = []
+    x = 0
+    for im, bbox in zip(images, bboxes):
+        canvas.paste(im, (x, 0))
+        strips.append((float(x), float(x + im.width), bbox[0] * scale, bbox[1] * scale))
+        x += im.width + _STRIP_GAP_PX
+    return canvas, strips
 
-    for row in ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=1, max_col=4):
-        for cell in row:
-            cell.alignment = Alignment(vertical="top", wrap_text=True)
 
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    wb.save(str(out_path))
+def _binarize_lut(threshold: int) -> bytes:
+    return bytes(255 if v >= threshold else 0 for v in range(256))
 
 
-async def _ocr_png_bytes(png_bytes: bytes) -> list[tuple[str, float, float, float, float]]:
-    stream = InMemoryRandomAccessStream()
-    writer = DataWriter(stream)
-    writer.write_bytes(png_bytes)
-    await writer.store_async()
-    stream.seek(0)
+def _render_gray(
+    pdfium_page: Any,
+    page_bbox: tuple,
+    bboxes: list[tuple],
+    resolution: int,
+    binarize_threshold: Optional[int] = None,
+) -> tuple[GrayBitmap, Optional[list[tuple[float, float, float, float]]]]:
+    # pdfium 直接渲染为 8 位灰度位图，bboxes 为空时渲染整页；单个区域且行无填充时传出 pdfium 缓冲区的视图。
+    # 省去的只是 PNG 编解码：OCR 端写入 IBuffer / 构造 SoftwareBitmap 以及 PNG 回退路径上像素仍会复制。
+    import pypdfium2
 
-    decoder = await BitmapDecoder.create_async(stream)
-    bmp = await decoder.get_software_bitmap_async()
+    scale = resolution / 72.0
+    px0, ptop = page_bbox[0], page_bbox[1]
+    pw = pdfium_page.get_width()
+    ph = pdfium_page.get_height()
+    lut = _binarize_lut(binarize_threshold) if binarize_threshold is not None else None
 
-    engine = OcrEngine.try_create_from_user_profile_languages()
-    if engine is None:
-        return []
-    res = await engine.recognize_async(bmp)
+    def render(crop: tuple[float, float, float, float]) -> tuple[Any, memoryview, int, int]:
+        bmp = pdfium_page.render(
+            scale=scale,
+            crop=crop,
+            grayscale=True,
+            force_bitmap_format=pypdfium2.raw.FPDFBitmap_Gray,
+        )
+        mv = memoryview(bmp.buffer).cast("B")
+        if bmp.stride != bmp.width:
+            mv = memoryview(
+                b"".join(mv[r * bmp.stride : r * bmp.stride + bmp.width] for r in range(bmp.height))
+            )
+        if lut is not None:
+            mv = memoryview(mv.tobytes().translate(lut))
+        return bmp, mv, bmp.width, bmp.height
 
-    words: list[tuple[str, float, float, float, float]] = []
-    for line in res.lines:
-        for w in line.words:
-            r = w.bounding_rect
-            words.append((w.text or "", r.x, r.y, r.width, r.height))
-    return words
+    if not bboxes:
+        bmp, mv, w, h = render((0, 0, 0, 0))
+        return GrayBitmap(w, h, mv, bmp), None
+
+    parts = []
+    for x0, top, x1, bottom in bboxes:
+        left = max(0.0, x0 - px0)
+        upper = max(0.0, top - ptop)
+        crop = (left, max(0.0, ph - (bottom - ptop)), max(0.0, pw - (x1 - px0)), upper)
+        bmp, mv, w, h = render(crop)
+        parts.append((bmp, mv, w, h, math.ceil(left * scale), math.ceil(upper * scale)))
+
+    if len(parts) == 1:
+        bmp, mv, w, h, off_x, off_y = parts[0]
+        return GrayBitmap(w, h, mv, bmp), [(0.0, float(w), float(off_x), float(off_y))]
+
+    width = sum(p[2] for p in parts) + _STRIP_GAP_PX * (len(parts) - 1)
+    height = max(p[3] for p in parts)
+    canvas = bytearray(b"\xff") * (width * height)
+    strips: list[tuple[float, float, float, float]] = []
+    x = 0
+    for _, mv, w, h, off_x, off_y in parts:
+        for r in range(h):
+            canvas[r * width + x : r * width + x + w] = mv[r * w : (r + 1) * w]
+        strips.append((float(x), float(x + w), float(off_x), float(off_y)))
+        x += w + _STRIP_GAP_PX
+    return GrayBitmap(width, height, memoryview(canvas), canvas), strips
+
+
+def _remap_words(words: list[Word], strips: list[tuple[float, float, float, float]]) -> list[Word]:
+    out: list[Word] = []
+    for text, x, y, w, h in words:
+        cx = x + w / 2
+        for sx0, sx1, off_x, off_y in strips:
+            if sx0 <= cx < sx1 + _STRIP_GAP_PX:
+                out.append((text, x - sx0 + off_x, y + off_y, w, h))
+                break
+    return out
+
+
+def _crop_bboxes(
+    table_bbox: tuple,
+    col_boxes: list[tuple],
+    crop: str,
+    crop_columns: Optional[list[int]],
+) -> tuple[str, list[tuple]]:
+    x0, top, x1, bottom = table_bbox
+    if crop == "columns" and crop_columns and max(crop_columns) < len(col_boxes):
+        boxes = []
+        for c_idx in crop_columns:
+            cb = col_boxes[c_idx]
+            boxes.append((max(x0, cb[0] - _STRIP_PAD_PT), top, min(x1, cb[2] + _STRIP_PAD_PT), bottom))
+        return "cols" + "-".join(str(c) for c in crop_columns), boxes
+    return "table", [table_bbox]
+
+
+def _put_until_stopped(q: "queue.Queue[Any]", item: Any, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.2)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _done_future(words: list[Word]) -> "Future[list[Word]]":
+    fut: "Future[list[Word]]" = Future()
+    fut.set_result(words)
+    return fut
+
+
+def _iter_page_ocr(
+    pdf_path: Path,
+    resolution: int,
+    stats: dict[str, Any],
+    backend: OcrBackend,
+    queue_depth: int = 2,
+    ocr_inflight: int = 2,
+    cache: Optional[OcrCache] = None,
+    refresh_cache: bool = False,
+    crop: str = "none",
+    crop_state: Optional[dict[str, Any]] = None,
+    raster: str = "png",
+    binarize_threshold: int = 160,
+    text_layer: str = "off",
+    text_min_chars: int = 20,
+    max_rss: int = 0,
+) -> Iterator[_PageJob]:
+    # 渲染线程 -> 编码线程 -> OCR 后端；各级队列有界，峰值内存受 queue_depth 约束。
+    # 结果按页序产出，表头检测等有状态逻辑与串行实现完全一致。
+    # 不需要图像的后端（文本层/回放）在渲染线程直接取词框，跳过渲染与编码。
+    # 命中 OCR 缓存的页同样直接带着词框进入后续阶段；未命中的页在取得结果后写回缓存。
+    # 裁剪模式只渲染主表区域；消费端在 crop_state["columns"] 写入表头列后，后续页只渲染这几列的条带。
+    # 词框在产出前平移回整页像素坐标，下游与整页渲染时一致。
+    # raster 为 gray/binary 时由 pdfium 直接渲染灰度原始像素，支持 recognize_gray 的后端跳过 PNG 编解码。
+    # text_layer=auto 时先判断页面文本层，可用则直接取表格单元格文本，只有纯图像页才渲染与 OCR。
+    # max_rss>0（字节）时，渲染每页前检查常驻内存，超出预算则暂停渲染，直到在途页处理完或内存回落。
+    depth = max(1, queue_depth)
+    render_q: "queue.Queue[Any]" = queue.Queue(maxsize=depth)
+    ocr_q: "queue.Queue[Any]" = queue.Queue(maxsize=depth)
+    inflight = threading.BoundedSemaphore(max(1, ocr_inflight))
+    stop = threading.Event()
+
+    raw_raster = raster != "png" and backend.needs_image
+    text_state: dict[str, bool] = {}
+    threshold = binarize_threshold if raster == "binary" else None
+    prof = profiling.active()
+    pending = [0]
+    pending_lock = threading.Lock()
+
+    def send(job: _PageJob) -> bool:
+        with pending_lock:
+            pending[0] += 1
+        return _put_until_stopped(render_q, job, stop)
+
+    def throttle() -> None:
+        rss = current_rss()
+        if rss is None or rss <= max_rss:
+            return
+        stats["pages_rss_throttled"] += 1
+        gc.collect()
+        while pending[0] > 0 and not stop.is_set():
+            time.sleep(0.02)
+            rss = current_rss()
+            if rss is not None and rss <= max_rss:
+                return
+
+    def render_stage() -> None:
+        pdfium_doc: Any = None
+        try:
+            content_hash = file_sha256(pdf_path) if cache is not None else ""
+            source_id = getattr(backend, "source_id", None)
+            source_tag = source_id(pdf_path) if cache is not None and source_id is not None else ""
+            if raw_raster:
+                import pypdfium2
+
+                with profiling.stage("pdf_open"):
+                    pdfium_doc = pypdfium2.PdfDocument(str(pdf_path))
+            import pdfplumber
+
+            with profiling.stage("pdf_open"):
+                pdf_file = pdfplumber.open(str(pdf_path))
+            geometry = _TableGeometryCache()
+            with pdf_file as pdf:
+                stats["pages_total"] = len(pdf.pages)
+                for page_index, page in enumerate(released_pages(pdf.pages)):
+                    if stop.is_set():
+                        return
+                    if max_rss > 0:
+                        throttle()
+                    table = _pick_main_table(page, geometry)
+                    if table is None:
+                        continue
+                    rows = table.rows
+                    cols = table.columns
+                    if len(cols) < 4 or len(rows) < 2:
+                        continue
+                    stats["pages_with_table"] += 1
+                    row_boxes = [r.bbox for r in rows]
+                    col_boxes = [c.bbox for c in cols]
+                    job = _PageJob(page_index, row_boxes, col_boxes, None)
+                    if text_layer == "auto" and backend.needs_image:
+                        job.cell_texts = _text_layer_cells(page, table, text_min_chars, text_state)
+                        if job.cell_texts is not None:
+                            stats["pages_text_layer"] += 1
+                            job.payload = _done_future([])
+                            if not send(job):
+                                return
+                            continue
+                    stats["pages_ocr"] += 1
+                    variant: list[str] = []
+                    crop_boxes: list[tuple] = []
+                    if crop != "none" and backend.needs_image:
+                        crop_columns = (crop_state or {}).get("columns")
+                        region, crop_boxes = _crop_bboxes(table.bbox, col_boxes, crop, crop_columns)
+                        variant.append(region)
+                    if raw_raster:
+                        variant.append(raster if threshold is None else f"{raster}{threshold}")
+                    if cache is not None:
+                        backend_id = backend.backend_id
+                        if source_tag:
+                            backend_id += "#" + source_tag
+                        if variant:
+                            backend_id += "@" + "+".join(variant)
+                        job.cache_key = page_key(content_hash, page_index, resolution, backend_id)
+                        cached = None if refresh_cache else cache.get(job.cache_key)
+                        if cached is not None:
+                            stats["ocr_cache_hits"] += 1
+                            job.payload = _done_future(cached)
+                            job.cache_key = None
+                        else:
+                            stats["ocr_cache_misses"] += 1
+                    if job.payload is None and raw_raster:
+                        pdfium_page = pdfium_doc[page_index]
+                        try:
+                            with profiling.stage("render"):
+                                job.payload, job.strips = _render_gray(
+                                    pdfium_page,
+                                    page.bbox,
+                                    crop_boxes,
+                                    resolution,
+                                    threshold,
+                                )
+                        finally:
+                            pdfium_page.close()
+                        stats["ocr_pixels"] += job.payload.width * job.payload.height
+                    elif job.payload is None and backend.needs_image:
+                        with profiling.stage("render"):
+                            if crop_boxes:
+                                job.payload, job.strips = _render_crop(page, crop_boxes, resolution)
+                            else:
+                                job.payload = page.to_image(resolution=resolution).original
+                        stats["ocr_pixels"] += job.payload.width * job.payload.height
+                    elif job.payload is None:
+                        with profiling.stage("ocr"):
+                            words = backend.words_for_page(pdf_path, page_index, page, resolution)
+                        job.payload = _done_future(words)
+                    if not send(job):
+                        return
+            stats["pages_geometry_reused"] = geometry.reused
+            _put_until_stopped(render_q, _PIPELINE_END, stop)
+        except BaseException as e:
+            _put_until_stopped(render_q, e, stop)
+        finally:
+            if pdfium_doc is not None:
+                pdfium_doc.close()
+
+    def encode_stage() -> None:
+        while not stop.is_set():
+            try:
+                item = render_q.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if item is _PIPELINE_END or isinstance(item, BaseException):
+                _put_until_stopped(ocr_q, item, stop)
+                return
+            job = item
+            if isinstance(job.payload, Future):
+                if not _put_until_stopped(ocr_q, job, stop):
+                    return
+                continue
+            gray_direct = isinstance(job.payload, GrayBitmap) and hasattr(backend, "recognize_gray")
+            if not gray_direct:
+                try:
+                    img = job.payload
+                    if isinstance(img, GrayBitmap):
+                        from PIL import Image
+
+                        img = Image.frombuffer("L", (img.width, img.height), img.data, "raw", "L", 0, 1)
+                    with profiling.stage("encode"):
+                        buf = io.BytesIO()
+                        img.save(buf, format="PNG")
+                        png_bytes = buf.getvalue()
+                except BaseException as e:
+                    _put_until_stopped(ocr_q, e, stop)
+                    return
+                del img, buf
+            while not inflight.acquire(timeout=0.2):
+                if stop.is_set():
+                    return
+            # OCR 为异步请求：从提交到完成回调计为 ocr 阶段（含后端内部排队）。
+            t_ocr = time.perf_counter()
+            try:
+                if gray_direct:
+                    job.payload = backend.recognize_gray(job.payload)
+                else:
+                    job.payload = backend.recognize(png_bytes)
+            except BaseException as e:
+                # 同步提交失败：归还并发许可，把异常交给消费端，避免其一直等待这一页。
+                inflight.release()
+                _put_until_stopped(ocr_q, e, stop)
+                return
+
+            def ocr_done(_f: Any, t0: float = t_ocr) -> None:
+                inflight.release()
+                if prof is not None:
+                    prof.add("ocr", t0, time.perf_counter())
+
+            job.payload.add_done_callback(ocr_done)
+            if not _put_until_stopped(ocr_q, job, stop):
+                return
+
+    threads = [
+        threading.Thread(target=render_stage, name="pdf-render", daemon=True),
+        threading.Thread(target=encode_stage, name="png-encode", daemon=True),
+    ]
+    for t in threads:
+        t.start()
+    try:
+        while True:
+            item = ocr_q.get()
+            if item is _PIPELINE_END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            job = item
+            with pending_lock:
+                pending[0] -= 1
+            words = job.payload.result()
+            if job.strips is not None:
+                words = _remap_words(words, job.strips)
+            if cache is not None and job.cache_key is not None:
+                cache.put(job.cache_key, words)
+            job.payload = None
+            job.words = words
+            yield job
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
 
 
 def _words_in_bbox(
-    words: list[tuple[str, float, float, float, float]],
+    words: list[Word],
     bbox_px: tuple[float, float, float, float],
 ) -> str:
     x0, top, x1, bottom = bbox_px
@@ -108,166 +513,656 @@ def _words_in_bbox(
     return "".join(t for _, t in chosen).strip()
 
 
-def _pick_main_table(page: pdfplumber.page.Page):
-    tables = page.find_tables(
-        {
-            "vertical_strategy": "lines",
-            "horizontal_strategy": "lines",
-            "intersection_tolerance": 5,
-            "snap_tolerance": 3,
-            "join_tolerance": 3,
-            "edge_min_length": 10,
-            "min_words_vertical": 1,
-            "min_words_horizontal": 1,
-        }
-    )
+def _interval_lookup(spans: list[tuple[float, float]]) -> Optional[tuple[list[int], list[float]]]:
+    # 按起点排序；若终点也单调不减，则覆盖某点 v 的区间恰是 bisect 位置向前的一段连续区间。
+    order = sorted(range(len(spans)), key=lambda i: spans[i][0])
+    ends = [spans[i][1] for i in order]
+    if any(ends[i] > ends[i + 1] for i in range(len(ends) - 1)):
+        return None
+    return order, [spans[i][0] for i in order]
+
+
+def _covering(
+    spans: list[tuple[float, float]],
+    lookup: tuple[list[int], list[float]],
+    v: float,
+) -> list[int]:
+    order, starts = lookup
+    k = bisect.bisect_right(starts, v) - 1
+    hit: list[int] = []
+    while k >= 0:
+        idx = order[k]
+        if spans[idx][1] < v:
+            break
+        hit.append(idx)
+        k -= 1
+    return hit
+
+
+class _TableTextCells:
+    def __init__(self, grid: list[list[Optional[str]]]) -> None:
+        self._grid = grid
+
+    def text(self, r_idx: int, c_idx: int) -> str:
+        row = self._grid[r_idx] if r_idx < len(self._grid) else []
+        v = row[c_idx] if c_idx < len(row) else None
+        return (v or "").strip()
+
+
+class _CellTextIndex:
+    # 一次遍历把每个词的中心点分桶到 (行, 列) 单元格，替代逐单元格全量扫描 _words_in_bbox。
+    # 边界判定（闭区间）、按 x 稳定排序后拼接与原实现逐字节一致；
+    # 行/列区间不单调（重叠嵌套）时退回原始扫描。
+    def __init__(
+        self,
+        words: list[Word],
+        row_boxes: list[tuple],
+        col_boxes: list[tuple],
+        scale: float,
+    ) -> None:
+        self._words = words
+        self._rows_px = [(b[1] * scale, b[3] * scale) for b in row_boxes]
+        self._cols_px = [(b[0] * scale, b[2] * scale) for b in col_boxes]
+        self._buckets: Optional[dict[tuple[int, int], list[tuple[float, str]]]] = None
+        self._texts: dict[tuple[int, int], str] = {}
+
+        row_lookup = _interval_lookup(self._rows_px)
+        col_lookup = _interval_lookup(self._cols_px)
+        if row_lookup is None or col_lookup is None:
+            return
+
+        buckets: dict[tuple[int, int], list[tuple[float, str]]] = {}
+        for text, x, y, w, h in words:
+            cx = x + w / 2
+            cy = y + h / 2
+            r_hits = _covering(self._rows_px, row_lookup, cy)
+            if not r_hits:
+                continue
+            c_hits = _covering(self._cols_px, col_lookup, cx)
+            for r_idx in r_hits:
+                for c_idx in c_hits:
+                    buckets.setdefault((r_idx, c_idx), []).append((x, text))
+        self._buckets = buckets
+
+    def text(self, r_idx: int, c_idx: int) -> str:
+        key = (r_idx, c_idx)
+        hit = self._texts.get(key)
+        if hit is not None:
+            return hit
+        if self._buckets is None:
+            top, bottom = self._rows_px[r_idx]
+            x0, x1 = self._cols_px[c_idx]
+            t = _words_in_bbox(self._words, (x0, top, x1, bottom))
+        else:
+            chosen = self._buckets.get(key, [])
+            chosen.sort(key=lambda t: t[0])
+            t = "".join(t for _, t in chosen).strip()
+        self._texts[key] = t
+        return t
+
+
+_TABLE_SETTINGS = {
+    "vertical_strategy": "lines",
+    "horizontal_strategy": "lines",
+    "intersection_tolerance": 5,
+    "snap_tolerance": 3,
+    "join_tolerance": 3,
+    "edge_min_length": 10,
+    "min_words_vertical": 1,
+    "min_words_horizontal": 1,
+}
+
+_GEOMETRY_QUANT_PT = 2.0
+_GEOMETRY_SAMPLES = 6
+_GEOMETRY_MAX_LAYOUTS = 8
+
+
+# 横线 (y, x起点, x终点) 与竖线 (x, y起点, y终点) 列表
+_Segments = tuple[list[tuple[float, float, float]], list[tuple[float, float, float]]]
+
+
+def _raw_segments(page: Page) -> _Segments:
+    # 直接读 line/rect 对象的坐标（朝向规则同 pdfplumber 的 line_to_edge/rect_to_edges），
+    # 不经 page.edges 为每条边复制一份对象字典。
+    hs: list[tuple[float, float, float]] = []
+    vs: list[tuple[float, float, float]] = []
+    for o in page.objects.get("line", ()):
+        if o["top"] == o["bottom"]:
+            hs.append((o["top"], o["x0"], o["x1"]))
+        else:
+            vs.append((o["x0"], o["top"], o["bottom"]))
+    for o in page.objects.get("rect", ()):
+        hs.append((o["top"], o["x0"], o["x1"]))
+        hs.append((o["bottom"], o["x0"], o["x1"]))
+        vs.append((o["x0"], o["top"], o["bottom"]))
+        vs.append((o["x1"], o["top"], o["bottom"]))
+    return hs, vs
+
+
+def _line_fingerprint(page: Page, segments: _Segments) -> tuple:
+    # 页面尺寸 + 长度达标的横线纵坐标、竖线横坐标集合（按 2pt 量化）；同一表格模板的各页取值相同。
+    min_len = _TABLE_SETTINGS["edge_min_length"]
+    hs, vs = segments
+    h_keys = {round(y / _GEOMETRY_QUANT_PT) for y, a, b in hs if b - a >= min_len}
+    v_keys = {round(x / _GEOMETRY_QUANT_PT) for x, a, b in vs if b - a >= min_len}
+    return round(page.width), round(page.height), tuple(sorted(h_keys)), tuple(sorted(v_keys))
+
+
+def _segments_confirm(segments: _Segments, cells: list[tuple]) -> bool:
+    # 抽样几个单元格，确认其上边与左边在本页确有对应的线段（坐标在吸附容差内且与单元格边重叠）。
+    tol = _TABLE_SETTINGS["snap_tolerance"]
+    hs, vs = segments
+    step = max(1, len(cells) // _GEOMETRY_SAMPLES)
+    for x0, top, x1, bottom in cells[::step][:_GEOMETRY_SAMPLES]:
+        if not any(abs(y - top) <= tol and a < x1 - tol and b > x0 + tol for y, a, b in hs):
+            return False
+        if not any(abs(x - x0) <= tol and a < bottom - tol and b > top + tol for x, a, b in vs):
+            return False
+    return True
+
+
+class _TableGeometryCache:
+    # 同一文件内表格线布局相同的页复用已识别主表的单元格几何，跳过 find_tables。
+    # 以线条指纹为键，命中后再抽样校验线段；不符或指纹不同的页仍完整识别，并登记新的布局。
+    def __init__(self) -> None:
+        self._cells: dict[tuple, Optional[list[tuple]]] = {}
+        self.reused = 0
+
+    def pick(self, page: Page) -> Any:
+        segments = _raw_segments(page)
+        fingerprint = _line_fingerprint(page, segments)
+        if fingerprint in self._cells:
+            cells = self._cells[fingerprint]
+            if cells is None:
+                self.reused += 1
+                return None
+            if _segments_confirm(segments, cells):
+                self.reused += 1
+                from pdfplumber.table import Table
+
+                return Table(page, cells)
+        table = _pick_main_table(page)
+        if fingerprint in self._cells or len(self._cells) < _GEOMETRY_MAX_LAYOUTS:
+            self._cells[fingerprint] = list(table.cells) if table is not None else None
+        return table
+
+
+def _pick_main_table(page: Page, geometry: Optional[_TableGeometryCache] = None):
+    if geometry is not None:
+        return geometry.pick(page)
+    with profiling.stage("find_tables"):
+        tables = page.find_tables(_TABLE_SETTINGS)
     if not tables:
         return None
     tables_sorted = sorted(tables, key=lambda t: len(t.cells), reverse=True)
     return tables_sorted[0]
 
 
+_HEADER_LAYOUT_KIND = "ocr_table"
+
+
 def _extract_from_pdf_scanned(
     pdf_path: Path,
     resolution: int = 180,
-) -> tuple[list[Record], dict[str, int]]:
+    queue_depth: int = 2,
+    ocr_inflight: int = 2,
+    ocr_backend: str = "winrt",
+    ocr_fixtures: str = "",
+    ocr_record: str = "",
+    ocr_cache: str = "",
+    cache_max_mb: int = 2048,
+    refresh_cache: bool = False,
+    crop: str = "none",
+    raster: str = "png",
+    binarize_threshold: int = 160,
+    text_layer: str = "off",
+    text_min_chars: int = 20,
+    header_registry: str = "",
+    max_rss_mb: int = 0,
+) -> tuple[list[Record], dict[str, Any]]:
     records: dict[str, Record] = {}
-    stats = {
+    stats: dict[str, Any] = {
         "pages_total": 0,
         "pages_with_table": 0,
         "pages_with_header": 0,
         "rows_emitted": 0,
         "rows_skipped_no_tag": 0,
+        "ocr_cache_hits": 0,
+        "ocr_cache_misses": 0,
+        "ocr_pixels": 0,
+        "pages_text_layer": 0,
+        "pages_ocr": 0,
+        "header_layout_hits": 0,
+        "pages_geometry_reused": 0,
+        "pages_rss_throttled": 0,
+        "peak_rss_bytes": 0,
     }
+    page_paths: list[str] = []
 
     header_cols: Optional[dict[str, int]] = None
     header_row_top_px: Optional[float] = None
 
     tag_re = re.compile(r"^[0-9A-Z]{2,}[-0-9A-Z]{3,}$")
 
-    with pdfplumber.open(str(pdf_path)) as pdf:
-        stats["pages_total"] = len(pdf.pages)
-        scale = resolution / 72.0
-
-        for page in pdf.pages:
-            table = _pick_main_table(page)
-            if table is None:
+    scale = resolution / 72.0
+    backend = get_backend(ocr_backend, ocr_fixtures or None)
+    cache = get_cache(ocr_cache, cache_max_mb * 1024 * 1024) if ocr_cache else None
+    recorded: dict[int, list[Word]] = {}
+    crop_state: dict[str, Any] = {"columns": None}
+    registry = get_registry(header_registry)
+    pages = _iter_page_ocr(
+        pdf_path,
+        resolution,
+        stats,
+        backend,
+        queue_depth=queue_depth,
+        ocr_inflight=ocr_inflight,
+        cache=cache,
+        refresh_cache=refresh_cache,
+        crop=crop,
+        crop_state=crop_state,
+        raster=raster,
+        binarize_threshold=binarize_threshold,
+        text_layer=text_layer,
+        text_min_chars=text_min_chars,
+        max_rss=max_rss_mb * 1024 * 1024,
+    )
+    for job in pages:
+        page_paths.append(f"{job.page_index + 1}:{job.path}")
+        rows = job.row_boxes
+        cols = job.col_boxes
+        if job.cell_texts is not None:
+            cells: Any = _TableTextCells(job.cell_texts)
+        else:
+            if ocr_record:
+                recorded[job.page_index] = job.words
+            if not job.words:
                 continue
+            with profiling.stage("cell_assign"):
+                cells = _CellTextIndex(job.words, rows, cols, scale)
 
-            rows = table.rows
-            cols = table.columns
-            if len(cols) < 4 or len(rows) < 2:
-                continue
+        fingerprint: Optional[str] = None
+        if header_cols is None:
+            with profiling.stage("header_detect"):
+                if registry is not None:
+                    # 已登记的表格布局（列数+列宽）只校验登记的表头行，省去前 6 行 × 12 列的逐格探测。
+                    fingerprint = table_fingerprint(cols)
+                    layout = registry.get(_HEADER_LAYOUT_KIND, fingerprint)
+                    if layout is not None:
+                        r_idx = int(layout["header_row"])
+                        cached: dict[str, int] = layout["columns"]
+                        ok = r_idx < len(rows) and all(
+                            c < len(cols) and h in _clean_ocr_text(cells.text(r_idx, c)) for h, c in cached.items()
+                        )
+                        registry.verified(ok)
+                        if ok:
+                            header_cols = dict(cached)
+                            header_row_top_px = rows[r_idx][1] * scale
+                            stats["pages_with_header"] += 1
+                            stats["header_layout_hits"] += 1
+                            crop_state["columns"] = sorted(header_cols.values())
 
-            stats["pages_with_table"] += 1
+                if header_cols is None:
+                    for r_idx in range(min(6, len(rows))):
+                        cell_texts = []
+                        for c_idx in range(min(len(cols), 12)):
+                            t = cells.text(r_idx, c_idx)
+                            cell_texts.append(_clean_ocr_text(t))
+                        joined = "".join(cell_texts)
+                        if all(h in joined for h in TARGET_HEADERS):
+                            header_cols = {}
+                            for c_idx, t in enumerate(cell_texts):
+                                for h in TARGET_HEADERS:
+                                    if h in t and h not in header_cols:
+                                        header_cols[h] = c_idx
+                            if len(header_cols) == 4:
+                                header_row_top_px = rows[r_idx][1] * scale
+                                stats["pages_with_header"] += 1
+                                crop_state["columns"] = sorted(header_cols.values())
+                                if fingerprint is not None:
+                                    registry.put(
+                                        _HEADER_LAYOUT_KIND, fingerprint, {"header_row": r_idx, "columns": header_cols}
+                                    )
+                                break
 
-            img = page.to_image(resolution=resolution).original
-            buf = io.BytesIO()
-            img.save(buf, format="PNG")
-            words = asyncio.run(_ocr_png_bytes(buf.getvalue()))
-            if not words:
-                continue
+        if header_cols is None:
+            continue
 
-            def cell_bbox_px(r_idx: int, c_idx: int) -> tuple[float, float, float, float]:
-                row_bbox = rows[r_idx].bbox
-                col_bbox = cols[c_idx].bbox
-                x0 = col_bbox[0]
-                x1 = col_bbox[2]
-                top = row_bbox[1]
-                bottom = row_bbox[3]
-                return (x0 * scale, top * scale, x1 * scale, bottom * scale)
-
-            if header_cols is None:
-                for r_idx in range(min(6, len(rows))):
-                    cell_texts = []
-                    for c_idx in range(min(len(cols), 12)):
-                        t = _words_in_bbox(words, cell_bbox_px(r_idx, c_idx))
-                        cell_texts.append(_clean_ocr_text(t))
-                    joined = "".join(cell_texts)
-                    if all(h in joined for h in TARGET_HEADERS):
-                        header_cols = {}
-                        for c_idx, t in enumerate(cell_texts):
-                            for h in TARGET_HEADERS:
-                                if h in t and h not in header_cols:
-                                    header_cols[h] = c_idx
-                        if len(header_cols) == 4:
-                            header_row_top_px = rows[r_idx].bbox[1] * scale
-                            stats["pages_with_header"] += 1
-                            break
+        start_row = 0
+        if header_row_top_px is not None:
+            for i, r in enumerate(rows):
+                if r[1] * scale >= header_row_top_px - 1:
+                    start_row = i + 1
+                    break
 
-            if header_cols is None:
+        for r_idx in range(start_row, len(rows)):
+            instrument = _clean_ocr_text(cells.text(r_idx, header_cols["仪表位号"]))
+            instrument = instrument.replace("\\", "-").replace("—", "-").replace("–", "-")
+            instrument_n = _norm(instrument)
+            if not instrument_n:
+                stats["rows_skipped_no_tag"] += 1
                 continue
 
-            start_row = 0
-            if header_row_top_px is not None:
-                for i, r in enumerate(rows):
-                    if r.bbox[1] * scale >= header_row_top_px - 1:
-                        start_row = i + 1
-                        break
-
-            for r_idx in range(start_row, len(rows)):
-                instrument = _clean_ocr_text(
-                    _words_in_bbox(words, cell_bbox_px(r_idx, header_cols["仪表位号"]))
-                )
-                instrument = instrument.replace("\\", "-").replace("—", "-").replace("–", "-")
-                instrument_n = _norm(instrument)
-                if not instrument_n:
-                    stats["rows_skipped_no_tag"] += 1
-                    continue
+            if not tag_re.match(instrument_n):
+                stats["rows_skipped_no_tag"] += 1
+                continue
 
-                if not tag_re.match(instrument_n):
-                    stats["rows_skipped_no_tag"] += 1
-                    continue
+            purpose = _clean_ocr_text(cells.text(r_idx, header_cols["用途"]))
+            measure_range = _clean_ocr_text(cells.text(r_idx, header_cols["测量范围"]))
+            unit = _clean_ocr_text(cells.text(r_idx, header_cols["工程单位"]))
 
-                purpose = _clean_ocr_text(
-                    _words_in_bbox(words, cell_bbox_px(r_idx, header_cols["用途"]))
-                )
-                measure_range = _clean_ocr_text(
-                    _words_in_bbox(words, cell_bbox_px(r_idx, header_cols["测量范围"]))
-                )
-                unit = _clean_ocr_text(
-                    _words_in_bbox(words, cell_bbox_px(r_idx, header_cols["工程单位"]))
+            if instrument_n not in records:
+                records[instrument_n] = Record(
+                    instrument_tag=instrument,
+                    purpose=purpose,
+                    measure_range=measure_range,
+                    unit=unit,
+                    source_file=pdf_path.name,
                 )
+                stats["rows_emitted"] += 1
 
-                if instrument_n not in records:
-                    records[instrument_n] = Record(
-                        instrument_tag=instrument,
-                        purpose=purpose,
-                        measure_range=measure_range,
-                        unit=unit,
-                        source_file=pdf_path.name,
-                    )
-                    stats["rows_emitted"] += 1
+    if ocr_record:
+        save_fixture(Path(ocr_record), pdf_path, resolution, recorded)
+    if registry is not None:
+        registry.save()
 
+    stats["page_paths"] = ",".join(page_paths)
+    stats["peak_rss_bytes"] = peak_rss() or 0
     return list(records.values()), stats
 
 
-def _discover_pdfs(folder: Path) -> list[Path]:
+def _prefer_pdf(kept: Optional[Path], candidate: Path) -> Path:
+    # 同一份文件的多个版本：按文件名顺序取第一个，但带 333 的优先于不带的。
+    if kept is None or ("333" in candidate.name and "333" not in kept.name):
+        return candidate
+    return kept
+
+
+_HASH_WORKERS = 4
+_hash_memo: dict[tuple[str, int, int], str] = {}
+
+
+def _content_hashes(paths: list[Path]) -> dict[Path, str]:
+    # 分块流式计算 SHA-256，多线程并行（hashlib 对大块数据释放 GIL）；按 (路径, 大小, mtime) 记忆，watch 模式各批不重复计算。
+    keyed = {p: (str(p), *file_stat(p)) for p in paths}
+    todo = [p for p, k in keyed.items() if k not in _hash_memo]
+    if todo:
+        with ThreadPoolExecutor(max_workers=min(_HASH_WORKERS, len(todo))) as ex:
+            for p, digest in zip(todo, ex.map(file_sha256, todo)):
+                _hash_memo[keyed[p]] = digest
+    return {p: _hash_memo[k] for p, k in keyed.items()}
+
+
+def _discover_pdfs(folder: Path, content_dedup: bool = True) -> tuple[list[Path], list[tuple[Path, Path]]]:
+    # 返回 (待处理 PDF, [(跳过的重复文件, 保留的文件)])。
+    # 先按文件名去掉 222/333 后缀归并；content_dedup 时再把内容完全相同的文件合并为一个：
+    # 只有大小相同的文件才需要计算哈希，全部在打开任何 PDF 之前完成，保留者仍按 _prefer_pdf 选择。
     pdfs = sorted(folder.glob("*.pdf"))
     prefer: dict[str, Path] = {}
     for p in pdfs:
         k = re.sub(r"\s+", "", p.name)
         k = k.replace("222.pdf", "").replace("333.pdf", "")
-        if k not in prefer:
-            prefer[k] = p
-        else:
-            if "333" in p.name and "333" not in prefer[k].name:
-                prefer[k] = p
-    return sorted(set(prefer.values()), key=lambda x: x.name)
+        prefer[k] = _prefer_pdf(prefer.get(k), p)
+    kept = sorted(set(prefer.values()), key=lambda x: x.name)
+    if not content_dedup or len(kept) < 2:
+        return kept, []
 
+    by_size: dict[int, list[Path]] = {}
+    for p in kept:
+        by_size.setdefault(p.stat().st_size, []).append(p)
+    same_size = [p for group in by_size.values() if len(group) > 1 for p in group]
+    if not same_size:
+        return kept, []
 
-def main() -> None:
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--input_dir", type=str, required=True)
-    ap.add_argument("--out", type=str, required=True)
-    ap.add_argument("--resolution", type=int, default=180)
-    args = ap.parse_args()
+    by_hash: dict[str, list[Path]] = {}
+    for p, digest in _content_hashes(same_size).items():
+        by_hash.setdefault(digest, []).append(p)
+    duplicates: list[tuple[Path, Path]] = []
+    for group in by_hash.values():
+        if len(group) < 2:
+            continue
+        winner: Optional[Path] = None
+        for p in sorted(group, key=lambda x: x.name):
+            winner = _prefer_pdf(winner, p)
+        duplicates.extend((p, winner) for p in group if p != winner)
+    skipped = {p for p, _ in duplicates}
+    return [p for p in kept if p not in skipped], sorted(duplicates, key=lambda d: d[0].name)
 
-    folder = Path(args.input_dir)
-    if not folder.exists():
-        raise FileNotFoundError(f"目录不存在：{folder}")
 
-    pdfs = _discover_pdfs(folder)
+# 影响提取结果的参数；清单中参数不同的条目视为过期。并发、缓存、录制等参数不影响结果，不计入。
+_RESULT_PARAMS = (
+    "resolution",
+    "ocr_backend",
+    "ocr_fixtures",
+    "crop",
+    "raster",
+    "binarize_threshold",
+    "text_layer",
+    "text_min_chars",
+)
+
+# 决定提取结果的源码模块：任一文件内容变化（位号正则、表头检测、后端取词等）都会使旧清单条目失效。
+_EXTRACTOR_SOURCES = ("extract_folder_range_check.py", "header_registry.py", "ocr_backends.py")
+
+
+@lru_cache(maxsize=None)
+def _extractor_version() -> str:
+    here = Path(__file__).resolve().parent
+    return ":".join(file_sha256(here / name)[:16] for name in _EXTRACTOR_SOURCES)
+
+
+def _file_worker_loop(conn: Any, profile: Optional[bool] = None) -> None:
+    # profile 不为 None 时在工作进程内启用分阶段计时（True 同时记录 trace 事件），随每个文件的结果送回父进程合并。
+    # 常驻池的任务参数逐批变化：OCR 缓存或表头登记路径与上一个任务不同时先关闭旧的，进程内不随输出目录累积连接。
+    prof = profiling.enable(trace=profile) if profile is not None else None
+    paths: Optional[tuple[str, str]] = None
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            task = None
+        if task is None:
+            close_caches()
+            close_registries()
+            return
+        idx, pdf_path, kwargs = task
+        task_paths = (kwargs.get("ocr_cache", ""), kwargs.get("header_registry", ""))
+        if paths is not None and task_paths != paths:
+            close_caches()
+            close_registries()
+        paths = task_paths
+        try:
+            recs, st = _extract_from_pdf_scanned(Path(pdf_path), **kwargs)
+            conn.send((idx, "ok", recs, st, prof.drain() if prof is not None else None))
+        except Exception as e:
+            conn.send((idx, "error", f"{type(e).__name__}: {e}", None, prof.drain() if prof is not None else None))
+
+
+class _FileWorkerPool:
+    # 按文件分发；单个文件超过墙钟超时后终止该工作进程并补一个新进程。
+    # persistent=True 时 run 结束后保留工作进程（OCR 引擎、缓存连接保持热状态），供下一批复用，由调用方 close。
+
+    def __init__(
+        self,
+        workers: int,
+        file_timeout: float,
+        kwargs: dict[str, Any],
+        persistent: bool = False,
+    ) -> None:
+        import multiprocessing as mp
+
+        self._ctx = mp.get_context("spawn")
+        self._workers = max(1, workers)
+        self._timeout = file_timeout
+        self._kwargs = kwargs
+        self._persistent = persistent
+        prof = profiling.active()
+        self._profile = None if prof is None else prof.tracing
+        self._procs: list[Any] = []
+        self._conns: list[Any] = []
+        self.recycled = 0
+
+    def _start_worker(self) -> tuple[Any, Any]:
+        parent_conn, child_conn = self._ctx.Pipe()
+        proc = self._ctx.Process(target=_file_worker_loop, args=(child_conn, self._profile), daemon=True)
+        proc.start()
+        child_conn.close()
+        return proc, parent_conn
+
+    def _replace(self, slot: int) -> None:
+        proc = self._procs[slot]
+        if proc.is_alive():
+            proc.terminate()
+        proc.join(5)
+        self._conns[slot].close()
+        self._procs[slot], self._conns[slot] = self._start_worker()
+        self.recycled += 1
+
+    def run(
+        self,
+        pdfs: list[Path],
+        kwargs: Optional[dict[str, Any]] = None,
+    ) -> Iterable[tuple[int, str, Any, Any]]:
+        # 按完成顺序产出 (序号, 状态, 记录或错误信息, 统计)，状态为 ok/error/timeout。
+        # kwargs 随每个文件发给工作进程，给出时覆盖构造时的参数（常驻池被不同参数的任务复用）。
+        from multiprocessing.connection import wait as _mp_wait
+
+        task_kwargs = self._kwargs if kwargs is None else kwargs
+
+        pending = list(enumerate(pdfs))
+        pending.reverse()
+        busy: dict[int, tuple[int, float]] = {}
+
+        while len(self._procs) < min(self._workers, len(pdfs)):
+            proc, conn = self._start_worker()
+            self._procs.append(proc)
+            self._conns.append(conn)
+
+        def dispatch(slot: int) -> None:
+            if not pending:
+                return
+            idx, pdf_path = pending.pop()
+            self._conns[slot].send((idx, str(pdf_path), task_kwargs))
+            busy[slot] = (idx, time.monotonic())
+
+        try:
+            for slot in range(len(self._procs)):
+                dispatch(slot)
+
+            while busy:
+                now = time.monotonic()
+                wait_for: Optional[float] = None
+                if self._timeout > 0:
+                    nearest = min(started for _, started in busy.values()) + self._timeout
+                    wait_for = max(0.0, nearest - now)
+
+                ready = _mp_wait([self._conns[s] for s in busy], timeout=wait_for)
+                for conn in ready:
+                    slot = self._conns.index(conn)
+                    idx, _ = busy.pop(slot)
+                    try:
+                        _, status, payload, st, prof_data = conn.recv()
+                        if prof_data is not None:
+                            profiling.enable().merge(prof_data)
+                    except (EOFError, OSError):
+                        status, payload, st = "error", "worker exited", None
+                        self._replace(slot)
+                    yield idx, status, payload, st
+                    dispatch(slot)
+
+                if self._timeout > 0:
+                    now = time.monotonic()
+                    for slot, (idx, started) in list(busy.items()):
+                        if now - started >= self._timeout:
+                            busy.pop(slot)
+                            self._replace(slot)
+                            yield idx, "timeout", f"超过 {self._timeout:g}s", None
+                            dispatch(slot)
+        finally:
+            if not self._persistent:
+                self.close()
+            else:
+                # 批次被中断时仍在处理的进程稍后会送回旧结果，直接替换，避免串入下一批。
+                for slot in list(busy):
+                    self._replace(slot)
+
+    def close(self) -> None:
+        for conn in self._conns:
+            try:
+                conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for proc in self._procs:
+            proc.join(1)
+            if proc.is_alive():
+                proc.terminate()
+                proc.join(1)
+        for conn in self._conns:
+            conn.close()
+        self._procs.clear()
+        self._conns.clear()
+
+
+# 常驻服务模式（keep_worker_pools）下，main 结束后不关闭工作进程池，后续任务直接复用热进程。
+# 池只按 (进程数, 超时, 是否计时/trace) 区分，提取参数随任务下发；池数超过上限时关闭最久未用的池。
+_shared_pools: Optional["OrderedDict[tuple, _FileWorkerPool]"] = None
+_MAX_SHARED_POOLS = 2
+
+
+def keep_worker_pools() -> None:
+    global _shared_pools
+    if _shared_pools is None:
+        _shared_pools = OrderedDict()
+
+
+def _shared_pool(
+    pools: "OrderedDict[tuple, _FileWorkerPool]",
+    workers: int,
+    file_timeout: float,
+    kwargs: dict[str, Any],
+) -> _FileWorkerPool:
+    prof = profiling.active()
+    key = (workers, file_timeout, None if prof is None else prof.tracing)
+    pool = pools.get(key)
+    if pool is None:
+        pool = _FileWorkerPool(workers, file_timeout, dict(kwargs), persistent=True)
+        pools[key] = pool
+        while len(pools) > _MAX_SHARED_POOLS:
+            _, stale = pools.popitem(last=False)
+            stale.close()
+    pools.move_to_end(key)
+    return pool
+
+
+def close_worker_pools() -> None:
+    if _shared_pools is None:
+        return
+    for pool in _shared_pools.values():
+        pool.close()
+    _shared_pools.clear()
+
+
+def _write_output_atomic(out_path: Path, records: list[Record]) -> None:
+    # 先写同目录临时文件再原子替换，读取方（Excel、下游脚本）不会看到写了一半的输出。
+    tmp = out_path.with_name(f".{out_path.stem}.tmp{out_path.suffix}")
+    try:
+        write_records(tmp, records, widths=[18, 28, 26, 12])
+        os.replace(tmp, out_path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def _run_folder(
+    args: argparse.Namespace,
+    folder: Path,
+    out_path: Path,
+    extract_kwargs: dict[str, Any],
+    manifest: Optional[RunManifest],
+    pool: Optional[_FileWorkerPool],
+    full: bool = False,
+) -> None:
+    pdfs, duplicates = _discover_pdfs(folder, content_dedup=not args.no_content_dedup)
     if not pdfs:
         raise FileNotFoundError(f"目录下未找到PDF：{folder}")
 
@@ -279,14 +1174,87 @@ def main() -> None:
         "pages_with_header": 0,
         "rows_emitted": 0,
         "rows_skipped_no_tag": 0,
+        "files_failed": 0,
+        "files_timed_out": 0,
+        "workers_recycled": 0,
+        "ocr_cache_hits": 0,
+        "ocr_cache_misses": 0,
+        "ocr_pixels": 0,
+        "pages_text_layer": 0,
+        "pages_ocr": 0,
+        "header_layout_hits": 0,
+        "pages_geometry_reused": 0,
+        "pages_rss_throttled": 0,
+        "files_reused": 0,
+        "manifest_pruned": 0,
+        "duplicates_skipped": len(duplicates),
     }
+    base_params = {"extractor": _extractor_version(), **{k: extract_kwargs[k] for k in _RESULT_PARAMS}}
+    params = params_signature(base_params)
+    fixture_dir = extract_kwargs["ocr_fixtures"] if extract_kwargs["ocr_backend"] == "fixture" else None
 
-    for pdf_path in pdfs:
-        try:
-            recs, st = _extract_from_pdf_scanned(pdf_path, resolution=args.resolution)
-        except Exception:
-            continue
+    def file_params(pdf_path: Path) -> str:
+        # 回放后端的结果还取决于该 PDF 对应回放文件的内容：重新录制到同一目录后不能复用旧结果。
+        if not fixture_dir:
+            return params
+        return params_signature({**base_params, "ocr_fixture_digest": fixture_digest(Path(fixture_dir), pdf_path)})
 
+    # 结果按 pdfs 的排序位置收集，合并时“先到先得”只取决于文件顺序而非完成顺序。
+    # 清单命中（大小/mtime/内容未变、参数与提取代码版本相同）的文件直接复用上次的记录与统计，只处理新增或变化的文件。
+    results: list[Optional[tuple[list[Record], dict[str, Any]]]] = [None] * len(pdfs)
+    todo: list[int] = []
+    seen: dict[int, tuple[int, int]] = {}
+    signatures: dict[int, str] = {}
+    if manifest is not None:
+        totals["manifest_pruned"] = manifest.prune(p.name for p in pdfs)
+    for idx, pdf_path in enumerate(pdfs):
+        entry = None
+        if manifest is not None:
+            signatures[idx] = file_params(pdf_path)
+        if manifest is not None and not (full or args.refresh_cache):
+            entry = manifest.lookup(pdf_path, signatures[idx])
+        if entry is not None:
+            results[idx] = ([Record(*r) for r in entry.records], entry.stats)
+            totals["files_reused"] += 1
+        else:
+            seen[idx] = file_stat(pdf_path)
+            todo.append(idx)
+
+    # 峰值内存只统计本次实际处理的文件（各工作进程的峰值取最大），复用清单结果的文件不计入。
+    peak = [peak_rss() or 0]
+
+    def finished(idx: int, recs: list[Record], st: dict[str, Any]) -> None:
+        # 每完成一个文件立即写入清单，运行中断后重跑从已完成的文件之后继续。
+        results[idx] = (recs, st)
+        peak[0] = max(peak[0], int(st.get("peak_rss_bytes", 0)))
+        if manifest is not None:
+            manifest.store(pdfs[idx], seen[idx], signatures[idx], (astuple(r) for r in recs), st)
+
+    if pool is not None and todo:
+        recycled_before = pool.recycled
+        for sub_idx, status, payload, st in pool.run([pdfs[i] for i in todo], extract_kwargs):
+            if status == "ok":
+                finished(todo[sub_idx], payload, st)
+            elif status == "timeout":
+                totals["files_timed_out"] += 1
+            else:
+                totals["files_failed"] += 1
+        totals["workers_recycled"] = pool.recycled - recycled_before
+    else:
+        for idx in todo:
+            try:
+                recs, st = _extract_from_pdf_scanned(pdfs[idx], **extract_kwargs)
+            except Exception:
+                totals["files_failed"] += 1
+                continue
+            finished(idx, recs, st)
+
+    for pdf_path, res in zip(pdfs, results):
+        if res is None:
+            continue
+        recs, st = res
+        if args.page_paths:
+            print(f"page_paths[{pdf_path.name}]={st.get('page_paths', '')}")
         totals["files"] += 1
         for k in totals:
             if k in st:
@@ -300,24 +1268,285 @@ def main() -> None:
     if not all_records:
         raise RuntimeError("未能从目录PDF中提取到有效记录（可能需要安装/启用系统OCR语言包）。")
 
-    out_path = Path(args.out)
     records_sorted = sorted(all_records.values(), key=lambda r: _norm(r.instrument_tag))
-    _write_excel(out_path, records_sorted)
+    with profiling.stage("save"):
+        _write_output_atomic(out_path, records_sorted)
 
     missing_any = sum(
         1
         for r in records_sorted
         if not (r.purpose and r.measure_range and r.unit)
     )
+    for dup, original in duplicates:
+        print(f"duplicate_skipped[{dup.name}]={original.name}")
     print(f"files_processed={totals['files']}")
+    print(f"duplicates_skipped={totals['duplicates_skipped']}")
+    print(f"files_reused={totals['files_reused']}")
+    print(f"manifest_pruned={totals['manifest_pruned']}")
+    print(f"files_failed={totals['files_failed']}")
+    print(f"files_timed_out={totals['files_timed_out']}")
+    print(f"workers_recycled={totals['workers_recycled']}")
     print(f"pages_total={totals['pages_total']}")
     print(f"pages_with_table={totals['pages_with_table']}")
+    print(f"pages_geometry_reused={totals['pages_geometry_reused']}")
     print(f"pages_with_header={totals['pages_with_header']}")
+    print(f"header_layout_hits={totals['header_layout_hits']}")
     print(f"rows_emitted={totals['rows_emitted']}")
+    print(f"ocr_cache_hits={totals['ocr_cache_hits']}")
+    print(f"ocr_cache_misses={totals['ocr_cache_misses']}")
+    print(f"ocr_pixels={totals['ocr_pixels']}")
+    print(f"pages_text_layer={totals['pages_text_layer']}")
+    print(f"pages_ocr={totals['pages_ocr']}")
+    print(f"pages_rss_throttled={totals['pages_rss_throttled']}")
+    print(f"peak_rss_mb={max(peak[0], peak_rss() or 0) / (1024 * 1024):.1f}")
     print(f"unique_instrument_tags={len(records_sorted)}")
     print(f"rows_with_missing_any_field={missing_any}")
     print(f"out={out_path}")
 
 
+class _FolderWatcher:
+    # 目录变化统一按快照 {PDF文件名: (大小, mtime)} 判定；装有 watchdog 时由文件系统事件（inotify 等）提前唤醒，
+    # 否则按 poll_interval 轮询。
+    def __init__(self, folder: Path, poll_interval: float) -> None:
+        self._folder = folder
+        self._interval = max(0.1, poll_interval)
+        self._event = threading.Event()
+        self._observer: Any = None
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return
+
+        event = self._event
+
+        class _Wake(FileSystemEventHandler):
+            def on_any_event(self, _event: Any) -> None:
+                event.set()
+
+        self._observer = Observer()
+        self._observer.schedule(_Wake(), str(folder), recursive=False)
+        self._observer.start()
+
+    @property
+    def mode(self) -> str:
+        return "events" if self._observer is not None else "polling"
+
+    def snapshot(self) -> dict[str, tuple[int, int]]:
+        snap: dict[str, tuple[int, int]] = {}
+        for p in self._folder.glob("*.pdf"):
+            try:
+                snap[p.name] = file_stat(p)
+            except OSError:
+                continue
+        return snap
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        self._event.wait(self._interval if timeout is None else min(timeout, self._interval))
+        self._event.clear()
+
+    def close(self) -> None:
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(5)
+
+
+def _watch_folder(
+    args: argparse.Namespace,
+    folder: Path,
+    out_path: Path,
+    extract_kwargs: dict[str, Any],
+    manifest: Optional[RunManifest],
+    pool: Optional[_FileWorkerPool],
+) -> None:
+    # 快照变化后等 debounce 秒内不再变化（拷贝/扫描写入完成）才跑一批；每批都经 _discover_pdfs 去重，
+    # 借助清单只处理新增或变化的文件，工作进程与缓存在批次之间保持常驻。
+    watcher = _FolderWatcher(folder, args.poll_interval)
+    print(f"watch={folder} mode={watcher.mode} debounce={args.debounce:g}s", flush=True)
+    built: Optional[dict[str, tuple[int, int]]] = None
+    pending: Optional[dict[str, tuple[int, int]]] = None
+    changed_at = time.monotonic()
+    full = args.full
+    try:
+        while True:
+            snap = watcher.snapshot()
+            now = time.monotonic()
+            if snap != pending:
+                pending = snap
+                changed_at = now
+            # 启动时立即跑第一批，之后每批都要等目录静默 debounce 秒。
+            if pending != built and (built is None or now - changed_at >= args.debounce):
+                started = time.monotonic()
+                print(f"batch_start={time.strftime('%Y-%m-%d %H:%M:%S')} pdfs={len(pending)}", flush=True)
+                try:
+                    _run_folder(args, folder, out_path, extract_kwargs, manifest, pool, full=full)
+                except PermissionError as e:
+                    # 输出文件被占用（如在 Excel 中打开）：本批不算完成，稍后重试。
+                    print(f"batch_error={type(e).__name__}: {e}", flush=True)
+                    watcher.wait(args.debounce)
+                    continue
+                except (FileNotFoundError, RuntimeError) as e:
+                    print(f"batch_error={type(e).__name__}: {e}", flush=True)
+                built = pending
+                full = False
+                print(f"batch_seconds={time.monotonic() - started:.2f}", flush=True)
+                continue
+            wait_for = None
+            if pending != built:
+                wait_for = max(0.05, args.debounce - (now - changed_at))
+            watcher.wait(wait_for)
+    except KeyboardInterrupt:
+        print("watch_stopped=1")
+    finally:
+        watcher.close()
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--input_dir", type=str, required=True)
+    ap.add_argument("--out", type=str, required=True, help=f"输出文件，按扩展名选择格式：{'/'.join(OUTPUT_SUFFIXES)}")
+    ap.add_argument("--resolution", type=int, default=180)
+    ap.add_argument("--workers", type=int, default=1, help="并行处理文件的进程数（1=当前进程串行）")
+    ap.add_argument(
+        "--file-timeout",
+        type=float,
+        default=900.0,
+        help="多进程模式下单个文件的墙钟超时秒数，超时后终止并替换该工作进程（0=不限）",
+    )
+    ap.add_argument("--queue-depth", type=int, default=2, help="渲染/编码/OCR 各级队列的最大页数（限制峰值内存）")
+    ap.add_argument("--ocr-inflight", type=int, default=2, help="同时进行中的 OCR 请求数")
+    ap.add_argument(
+        "--max-rss",
+        type=int,
+        default=0,
+        metavar="MB",
+        help="每个处理进程的常驻内存预算（MB）；超出时暂停渲染新页，等在途页处理完再继续（0=不限）",
+    )
+    ap.add_argument(
+        "--ocr-backend",
+        choices=OCR_BACKENDS,
+        default="winrt",
+        help="词框来源：winrt=Windows系统OCR；textlayer=PDF文本层；fixture=回放录制的JSON",
+    )
+    ap.add_argument("--ocr-fixtures", type=str, default="", help="fixture 后端读取的回放目录")
+    ap.add_argument("--ocr-record", type=str, default="", help="将每页词框录制为JSON写入该目录")
+    ap.add_argument(
+        "--ocr-cache",
+        type=str,
+        default="",
+        help="OCR结果缓存库路径（默认：输出文件同目录下 .ocr_cache.sqlite）",
+    )
+    ap.add_argument("--cache-max-mb", type=int, default=2048, help="OCR缓存大小上限（MB），超出按LRU淘汰")
+    ap.add_argument("--no-cache", action="store_true", help="不读写OCR缓存")
+    ap.add_argument("--refresh-cache", action="store_true", help="忽略已有缓存重新OCR，并覆盖写回")
+    ap.add_argument(
+        "--crop",
+        choices=CROP_MODES,
+        default="none",
+        help="OCR渲染范围：none=整页；table=仅主表区域；columns=识别表头后仅渲染四个目标列条带",
+    )
+    ap.add_argument(
+        "--raster",
+        choices=RASTER_MODES,
+        default="png",
+        help="送入OCR的图像：png=彩色图PNG编码；gray=8位灰度原始像素；binary=灰度后按阈值二值化",
+    )
+    ap.add_argument("--binarize-threshold", type=int, default=160, help="binary 模式的灰度阈值（0-255）")
+    ap.add_argument(
+        "--text-layer",
+        choices=TEXT_LAYER_MODES,
+        default="auto",
+        help="auto=有可用文本层的页直接取表格文本，仅纯图像页OCR；off=所有页都OCR",
+    )
+    ap.add_argument("--text-min-chars", type=int, default=20, help="主表区域内文本层字符数达到该值才视为可用")
+    ap.add_argument("--page-paths", action="store_true", help="逐文件打印每页走的路径（text/ocr）")
+    ap.add_argument("--no-content-dedup", action="store_true", help="不按内容哈希合并文件名不同但内容相同的PDF")
+    ap.add_argument(
+        "--header-registry",
+        type=str,
+        default="",
+        help="表头布局登记文件（默认：输出文件同目录下 .header_layouts.json）；已知表格布局直接复用表头行与列",
+    )
+    ap.add_argument("--no-header-registry", action="store_true", help="不使用表头布局登记，每个文件都完整探测表头")
+    ap.add_argument(
+        "--manifest",
+        type=str,
+        default="",
+        help="增量运行清单路径（默认：输出文件同目录下 .<输出文件名>.manifest.sqlite）；未变化的PDF直接复用上次结果",
+    )
+    ap.add_argument("--full", action="store_true", help="忽略清单中的已有结果，全部重新处理（仍会更新清单）")
+    ap.add_argument("--no-manifest", action="store_true", help="不读写增量运行清单")
+    ap.add_argument(
+        "--watch",
+        action="store_true",
+        help="常驻监视输入目录：新增/变化的PDF稳定后增量处理并原子更新输出（Ctrl+C 退出）",
+    )
+    ap.add_argument("--debounce", type=float, default=2.0, help="watch 模式下文件大小/mtime 保持不变多少秒后才处理")
+    ap.add_argument("--poll-interval", type=float, default=1.0, help="watch 模式下目录轮询间隔秒数")
+    profiling.add_argument(ap)
+    args = ap.parse_args(argv)
+    # 输出格式在开始任何 OCR 之前检查；否则要等全部处理完才在写出时报错（watch 模式下会直接退出守护循环）。
+    if Path(args.out).suffix.lower() not in OUTPUT_SUFFIXES:
+        ap.error(f"--out 不支持的输出格式：{Path(args.out).suffix or '（无扩展名）'}（可选：{', '.join(OUTPUT_SUFFIXES)}）")
+    profiling.enable_from_args(args)
+
+    folder = Path(args.input_dir)
+    if not folder.exists():
+        raise FileNotFoundError(f"目录不存在：{folder}")
+
+    out_path = Path(args.out)
+    ocr_cache = ""
+    if not args.no_cache:
+        ocr_cache = args.ocr_cache or str(out_path.parent / ".ocr_cache.sqlite")
+    header_registry = ""
+    if not args.no_header_registry:
+        header_registry = args.header_registry or str(out_path.parent / ".header_layouts.json")
+
+    extract_kwargs: dict[str, Any] = {
+        "resolution": args.resolution,
+        "queue_depth": args.queue_depth,
+        "ocr_inflight": args.ocr_inflight,
+        "ocr_backend": args.ocr_backend,
+        "ocr_fixtures": args.ocr_fixtures,
+        "ocr_record": args.ocr_record,
+        "ocr_cache": ocr_cache,
+        "cache_max_mb": args.cache_max_mb,
+        "refresh_cache": args.refresh_cache,
+        "crop": args.crop,
+        "raster": args.raster,
+        "binarize_threshold": args.binarize_threshold,
+        "text_layer": args.text_layer,
+        "text_min_chars": args.text_min_chars,
+        "header_registry": header_registry,
+        "max_rss_mb": args.max_rss,
+    }
+
+    manifest: Optional[RunManifest] = None
+    if not args.no_manifest:
+        manifest_path = args.manifest or str(out_path.with_name(f".{out_path.name}.manifest.sqlite"))
+        manifest = RunManifest(Path(manifest_path))
+    elif args.watch:
+        # watch 模式必须记住已处理过的文件；不落盘时用内存清单。
+        manifest = RunManifest(Path(":memory:"))
+
+    pool: Optional[_FileWorkerPool] = None
+    if args.workers > 1 and _shared_pools is not None:
+        pool = _shared_pool(_shared_pools, args.workers, args.file_timeout, extract_kwargs)
+    elif args.workers > 1:
+        pool = _FileWorkerPool(args.workers, args.file_timeout, extract_kwargs, persistent=args.watch)
+    try:
+        if args.watch:
+            _watch_folder(args, folder, out_path, extract_kwargs, manifest, pool)
+        else:
+            _run_folder(args, folder, out_path, extract_kwargs, manifest, pool, full=args.full)
+    finally:
+        if pool is not None and _shared_pools is None:
+            pool.close()
+        close_caches()
+        if manifest is not None:
+            manifest.close()
+        profiling.write_from_args(args)
+
+
 if __name__ == "__main__":
     main()
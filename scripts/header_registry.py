@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+
+def _digest(parts: Any) -> str:
+    raw = json.dumps(parts, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def sheet_fingerprint(sheet_name: str, row_index: int, row_values: Iterable[object]) -> str:
+    # 工作表指纹：Sheet 名 + 第一个非空行的行号与 (列号, 去空白后的值)；模板相同的文件取值一致。
+    cells = []
+    for i, v in enumerate(row_values, start=1):
+        if v is None:
+            continue
+        s = "".join(str(v).split())
+        if s:
+            cells.append((i, s))
+    return _digest(["sheet", sheet_name, row_index, cells])
+
+
+def table_fingerprint(col_boxes: list[tuple]) -> str:
+    # 页面表格指纹：列数 + 各列宽（取整到 1pt），只依赖表格线几何，OCR 之前即可计算。
+    widths = [round(float(c[2]) - float(c[0])) for c in col_boxes]
+    return _digest(["table", len(widths), widths])
+
+
+class HeaderRegistry:
+    # 表头布局登记表：指纹 -> {"header_row": 行号, "columns": {字段: 列号}}，按 kind 分区，JSON 单文件持久化。
+    # 命中后调用方只需校验缓存的表头行，校验失败则回退完整检测并覆盖登记；保存时与磁盘上的新内容合并，原子替换。
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._layouts: dict[str, dict[str, Any]] = self._read()
+        self._dirty: dict[str, dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.mismatches = 0
+
+    def _read(self) -> dict[str, dict[str, Any]]:
+        try:
+            data = json.loads(self._path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    @staticmethod
+    def _key(kind: str, fingerprint: str) -> str:
+        return f"{kind}:{fingerprint}"
+
+    def get(self, kind: str, fingerprint: str) -> Optional[dict[str, Any]]:
+        with self._lock:
+            layout = self._layouts.get(self._key(kind, fingerprint))
+            if layout is None:
+                self.misses += 1
+            return layout
+
+    def verified(self, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self.hits += 1
+            else:
+                self.mismatches += 1
+
+    def put(self, kind: str, fingerprint: str, layout: dict[str, Any]) -> None:
+        key = self._key(kind, fingerprint)
+        with self._lock:
+            if self._layouts.get(key) == layout:
+                return
+            self._layouts[key] = layout
+            self._dirty[key] = layout
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            merged = self._read()
+            merged.update(self._dirty)
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self._path.with_name(f"{self._path.name}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(merged, ensure_ascii=False, indent=1), encoding="utf-8")
+            tmp.replace(self._path)
+            self._layouts.update(merged)
+            self._dirty.clear()
+
+
+_registries: dict[str, HeaderRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(path: str) -> Optional[HeaderRegistry]:
+    if not path:
+        return None
+    with _registries_lock:
+        registry = _registries.get(path)
+        if registry is None:
+            registry = HeaderRegistry(Path(path))
+            _registries[path] = registry
+        return registry
+
+
+def close_registries() -> None:
+    # 写回未保存的布局并丢弃进程内副本；常驻进程切换到另一套输出目录时调用，避免登记对象随路径无限累积。
+    with _registries_lock:
+        for registry in _registries.values():
+            registry.save()
+        _registries.clear()
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import sys
+from typing import Any, Iterable, Iterator, Optional
+
+# 当前/峰值常驻内存（字节）：优先 psutil；否则 Linux 读 /proc，Windows 调 GetProcessMemoryInfo，其余平台用 resource。
+# 取不到时返回 None，调用方据此跳过内存预算与统计。
+
+
+def _windows_counters() -> Optional[tuple[int, int]]:
+    import ctypes
+    from ctypes import wintypes
+
+    class _Counters(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = _Counters()
+    counters.cb = ctypes.sizeof(counters)
+    kernel32 = ctypes.WinDLL("kernel32")
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    ok = kernel32.K32GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb)
+    if not ok:
+        return None
+    return int(counters.WorkingSetSize), int(counters.PeakWorkingSetSize)
+
+
+def current_rss() -> Optional[int]:
+    try:
+        import psutil
+    except ImportError:
+        psutil = None  # type: ignore[assignment]
+    if psutil is not None:
+        return int(psutil.Process().memory_info().rss)
+    if sys.platform == "win32":
+        counters = _windows_counters()
+        return counters[0] if counters else None
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    import resource
+
+    return pages * resource.getpagesize()
+
+
+def peak_rss() -> Optional[int]:
+    if sys.platform == "win32":
+        counters = _windows_counters()
+        return counters[1] if counters else None
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 计，macOS 以字节计。
+    return int(peak) if sys.platform == "darwin" else int(peak) * 1024
+
+
+def released_pages(pages: Iterable[Any]) -> Iterator[Any]:
+    # 逐页产出 pdfplumber 页面，调用方取下一页（或提前结束）时释放上一页缓存的解析对象（字符、线条、layout），
+    # 内存占用不随页数增长。
+    for page in pages:
+        try:
+            yield page
+        finally:
+            page.close()
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Optional
+
+from ocr_backends import Word
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def page_key(content_hash: str, page_index: int, resolution: int, backend_id: str) -> str:
+    return f"{content_hash}:{page_index}:{resolution}:{backend_id}"
+
+
+class OcrCache:
+    # 以 (PDF内容哈希, 页序号, 分辨率, 后端) 为键缓存每页词框；SQLite 单文件，多进程共享（WAL）。
+    # 总大小超过 max_bytes 时按最近使用时间淘汰。
+    _EVICT_EVERY = 64
+
+    def __init__(self, db_path: Path, max_bytes: int) -> None:
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._path = db_path
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._puts_since_evict = 0
+        self._conn = sqlite3.connect(str(db_path), timeout=30.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS page_words ("
+            " key TEXT PRIMARY KEY,"
+            " words BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_page_words_last_used ON page_words(last_used)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[list[Word]]:
+        with self._lock:
+            row = self._conn.execute("SELECT words FROM page_words WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE page_words SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        raw = json.loads(zlib.decompress(row[0]).decode("utf-8"))
+        return [(str(t), float(x), float(y), float(w), float(h)) for t, x, y, w, h in raw]
+
+    def put(self, key: str, words: list[Word]) -> None:
+        blob = zlib.compress(json.dumps(words, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO page_words(key, words, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, blob, len(blob), time.time()),
+            )
+            self._conn.commit()
+            self._puts_since_evict += 1
+            if self._puts_since_evict >= self._EVICT_EVERY:
+                self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        self._puts_since_evict = 0
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM page_words").fetchone()[0]
+        if total <= self._max_bytes:
+            return
+        excess = total - self._max_bytes
+        freed = 0
+        victims: list[str] = []
+        for key, size in self._conn.execute("SELECT key, size FROM page_words ORDER BY last_used ASC"):
+            victims.append(key)
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM page_words WHERE key = ?", [(k,) for k in victims])
+        self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._evict_locked()
+            self._conn.close()
+
+
+_caches: dict[str, OcrCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(db_path: str, max_bytes: int) -> OcrCache:
+    with _caches_lock:
+        cache = _caches.get(db_path)
+        if cache is None:
+            cache = OcrCache(Path(db_path), max_bytes)
+            _caches[db_path] = cache
+        return cache
+
+
+def close_caches() -> None:
+    with _caches_lock:
+        for cache in _caches.values():
+            cache.close()
+        _caches.clear()
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+# 分阶段计时：各脚本在关键步骤外包一层 stage("名称")。未启用 --profile 时 stage() 直接返回共享的空上下文，
+# 开销只有一次全局变量判断；启用后按阶段累计墙钟时间/次数/最大值，可选记录 Chrome trace 事件。
+# 多线程流水线中各阶段并行执行，阶段耗时之和可以大于总墙钟时间。
+
+_NULL = nullcontext()
+_MAX_TRACE_EVENTS = 500_000
+
+
+class Profiler:
+    def __init__(self, trace: bool = False) -> None:
+        self._lock = threading.Lock()
+        self._stages: dict[str, list[float]] = {}
+        self._events: Optional[list[dict[str, Any]]] = [] if trace else None
+        self.dropped_events = 0
+        self._started = time.perf_counter()
+
+    def add(self, name: str, t0: float, t1: float) -> None:
+        # t0/t1 为 time.perf_counter() 读数；跨线程（如 OCR 完成回调）记录时直接调用。
+        dt = t1 - t0
+        with self._lock:
+            st = self._stages.get(name)
+            if st is None:
+                self._stages[name] = [dt, 1, dt]
+            else:
+                st[0] += dt
+                st[1] += 1
+                if dt > st[2]:
+                    st[2] = dt
+            if self._events is not None:
+                if len(self._events) < _MAX_TRACE_EVENTS:
+                    self._events.append(
+                        {
+                            "name": name,
+                            "ph": "X",
+                            "ts": round(t0 * 1e6, 1),
+                            "dur": round(dt * 1e6, 1),
+                            "pid": os.getpid(),
+                            "tid": threading.get_ident(),
+                        }
+                    )
+                else:
+                    self.dropped_events += 1
+
+    @property
+    def tracing(self) -> bool:
+        return self._events is not None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, t0, time.perf_counter())
+
+    def drain(self) -> dict[str, Any]:
+        # 取出并清空已累计的数据，供工作进程随每个文件的结果送回父进程合并。
+        with self._lock:
+            data = {"stages": self._stages, "events": self._events or [], "dropped": self.dropped_events}
+            self._stages = {}
+            if self._events is not None:
+                self._events = []
+            self.dropped_events = 0
+        return data
+
+    def merge(self, data: dict[str, Any]) -> None:
+        with self._lock:
+            for name, (seconds, count, longest) in data.get("stages", {}).items():
+                st = self._stages.get(name)
+                if st is None:
+                    self._stages[name] = [seconds, count, longest]
+                else:
+                    st[0] += seconds
+                    st[1] += count
+                    st[2] = max(st[2], longest)
+            self.dropped_events += int(data.get("dropped", 0))
+            if self._events is not None:
+                room = _MAX_TRACE_EVENTS - len(self._events)
+                events = data.get("events", [])
+                self._events.extend(events[:room])
+                self.dropped_events += max(0, len(events) - room)
+
+    def report(self) -> dict[str, Any]:
+        with self._lock:
+            stages = {
+                name: {
+                    "seconds": round(seconds, 6),
+                    "count": int(count),
+                    "mean_ms": round(seconds / count * 1000, 3) if count else 0.0,
+                    "max_ms": round(longest * 1000, 3),
+                }
+                for name, (seconds, count, longest) in sorted(self._stages.items(), key=lambda kv: -kv[1][0])
+            }
+            return {
+                "wall_seconds": round(time.perf_counter() - self._started, 6),
+                "stages": stages,
+                "trace_events_dropped": self.dropped_events,
+            }
+
+    def write(self, report_path: str, trace_path: str = "") -> None:
+        # report_path 为 "-" 时写到标准错误，不干扰脚本在标准输出上的 key=value 统计。
+        text = json.dumps(self.report(), ensure_ascii=False, indent=2)
+        if report_path == "-":
+            print(text, file=sys.stderr)
+        else:
+            Path(report_path).write_text(text, encoding="utf-8")
+        if trace_path and self._events is not None:
+            with self._lock:
+                events = list(self._events)
+            Path(trace_path).write_text(
+                json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, ensure_ascii=False),
+                encoding="utf-8",
+            )
+
+
+_active: Optional[Profiler] = None
+
+
+def enable(trace: bool = False) -> Profiler:
+    global _active
+    if _active is None:
+        _active = Profiler(trace=trace)
+    return _active
+
+
+def disable() -> None:
+    # 常驻进程中逐任务启用：任务结束后调用，下一个任务重新按参数决定是否计时。
+    global _active
+    _active = None
+
+
+def active() -> Optional[Profiler]:
+    return _active
+
+
+def stage(name: str) -> Any:
+    p = _active
+    if p is None:
+        return _NULL
+    return p.stage(name)
+
+
+def add_argument(ap: Any) -> None:
+    ap.add_argument(
+        "--profile",
+        nargs="?",
+        const="-",
+        default="",
+        metavar="JSON",
+        help="记录各阶段耗时并输出汇总 JSON（不给路径时写到标准错误）",
+    )
+    ap.add_argument(
+        "--profile-trace",
+        default="",
+        metavar="JSON",
+        help="额外写出 Chrome trace 文件（chrome://tracing / Perfetto）",
+    )
+
+
+def enable_from_args(args: Any) -> Optional[Profiler]:
+    if not (args.profile or args.profile_trace):
+        return None
+    return enable(trace=bool(args.profile_trace))
+
+
+def write_from_args(args: Any) -> None:
+    p = _active
+    if p is not None:
+        p.write(args.profile or "-", args.profile_trace)
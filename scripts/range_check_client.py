@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from typing import Any, Optional
+
+# range_check_server.py 的轻量客户端：只用标准库，启动开销接近空解释器。
+# 用法：python range_check_client.py compare --base a.xlsx --compare b.xlsx ...
+#       python range_check_client.py status | job <id>
+# 任务参数原样转给对应脚本，相对路径按客户端当前目录解析；退出码与直接运行脚本一致。
+
+JOB_KINDS = ("compare", "extract", "folder")
+
+
+def default_token_file(port: int) -> Path:
+    # 服务端未指定 --token 时把随机令牌写在这里，客户端按 URL 的端口找到它。
+    return Path.home() / f".range_check_server_{port}.token"
+
+
+def _resolve_token(url: str, token: str, token_file: str) -> str:
+    if token:
+        return token
+    path = Path(token_file) if token_file else default_token_file(urllib.parse.urlsplit(url).port or 80)
+    try:
+        return path.read_text(encoding="utf-8").strip()
+    except OSError:
+        return ""
+
+
+def _request(
+    url: str,
+    token: str,
+    data: Optional[dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+) -> tuple[int, dict[str, Any]]:
+    body = None if data is None else json.dumps(data, ensure_ascii=False).encode("utf-8")
+    req = urllib.request.Request(url, data=body, method="GET" if body is None else "POST")
+    req.add_header("Content-Type", "application/json; charset=utf-8")
+    if token:
+        req.add_header("X-Job-Token", token)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read().decode("utf-8") or "{}")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="向常驻任务服务提交比对/提取任务。")
+    ap.add_argument("--url", default=os.environ.get("RANGE_CHECK_URL", "http://127.0.0.1:8765"))
+    ap.add_argument(
+        "--token",
+        default=os.environ.get("RANGE_CHECK_TOKEN", ""),
+        help="X-Job-Token（默认：读取服务端写在用户主目录下的令牌文件）",
+    )
+    ap.add_argument("--token-file", default="", help="令牌文件路径（与服务端 --token-file 相同）")
+    ap.add_argument("--no-wait", action="store_true", help="只提交任务并打印任务 id，不等待完成")
+    ap.add_argument("--timeout", type=float, default=0.0, help="等待结果的秒数上限（0=不限）")
+    ap.add_argument("command", choices=JOB_KINDS + ("status", "job"))
+    ap.add_argument("args", nargs=argparse.REMAINDER, help="任务参数（原样转给对应脚本）或任务 id")
+    args = ap.parse_args(argv)
+
+    base = args.url.rstrip("/")
+    token = _resolve_token(base, args.token, args.token_file)
+    timeout = args.timeout or None
+    try:
+        if args.command == "status":
+            code, body = _request(f"{base}/status", token, timeout=timeout)
+        elif args.command == "job":
+            if len(args.args) != 1:
+                ap.error("job 需要一个任务 id")
+            code, body = _request(f"{base}/jobs/{args.args[0]}", token, timeout=timeout)
+        else:
+            payload = {"kind": args.command, "argv": args.args, "cwd": os.getcwd(), "wait": not args.no_wait}
+            code, body = _request(f"{base}/jobs", token, payload, timeout=timeout)
+    except (urllib.error.URLError, OSError) as e:
+        print(f"无法连接任务服务 {base}：{e}", file=sys.stderr)
+        return 2
+
+    if code >= 400:
+        print(f"失败（HTTP {code}）：{body.get('error', '')}", file=sys.stderr)
+        return 2
+    if args.command in JOB_KINDS and not args.no_wait:
+        sys.stdout.write(body.get("output", ""))
+        if body.get("error"):
+            print(f"失败：{body['error']}", file=sys.stderr)
+        return int(body.get("exit_code", 2))
+    print(json.dumps(body, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import csv
+import json
+from copy import copy
+from pathlib import Path
+from typing import Any, Iterable, Optional, Sequence
+
+OUTPUT_HEADERS = ["仪表位号", "用途", "测量范围", "工程单位"]
+OUTPUT_FIELDS = ["instrument_tag", "purpose", "measure_range", "unit"]
+
+OUTPUT_SUFFIXES = (".xlsx", ".csv", ".jsonl", ".parquet", ".arrow", ".feather")
+
+_ARROW_BATCH_ROWS = 65536
+
+
+def _row(r: Any) -> list[str]:
+    return [r.instrument_tag, r.purpose, r.measure_range, r.unit]
+
+
+def _write_xlsx(out_path: Path, records: Iterable[Any], widths: Sequence[float]) -> int:
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Font
+
+    # write_only 模式逐行写出，不在内存中保留整张表；样式只构造一次，逐单元格复制其样式索引。
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("提取结果")
+    ws.freeze_panes = "A2"
+    for i, w in enumerate(widths, start=1):
+        ws.column_dimensions[openpyxl.utils.get_column_letter(i)].width = w
+
+    header_tpl = WriteOnlyCell(ws)
+    header_tpl.font = Font(bold=True)
+    header_tpl.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+    data_tpl = WriteOnlyCell(ws)
+    data_tpl.alignment = Alignment(vertical="top", wrap_text=True)
+    header_style = header_tpl._style
+    data_style = data_tpl._style
+
+    def styled(value: object, style: Any) -> WriteOnlyCell:
+        cell = WriteOnlyCell(ws, value)
+        cell._style = copy(style)
+        return cell
+
+    ws.append([styled(h, header_style) for h in OUTPUT_HEADERS])
+    n = 0
+    for r in records:
+        ws.append([styled(v, data_style) for v in _row(r)])
+        n += 1
+    ws.auto_filter.ref = f"A1:D{n + 1}"
+    wb.save(str(out_path))
+    return n
+
+
+def _write_csv(out_path: Path, records: Iterable[Any]) -> int:
+    n = 0
+    with out_path.open("w", encoding="utf-8-sig", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(OUTPUT_HEADERS)
+        for r in records:
+            w.writerow(_row(r))
+            n += 1
+    return n
+
+
+def _write_jsonl(out_path: Path, records: Iterable[Any]) -> int:
+    n = 0
+    with out_path.open("w", encoding="utf-8") as f:
+        for r in records:
+            f.write(json.dumps(dict(zip(OUTPUT_FIELDS, _row(r))), ensure_ascii=False))
+            f.write("\n")
+            n += 1
+    return n
+
+
+def _write_arrow(out_path: Path, records: Iterable[Any], fmt: str) -> int:
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise RuntimeError(f"写出 {out_path.suffix} 需要安装 pyarrow（pip install pyarrow）。") from e
+
+    schema = pa.schema([(name, pa.string()) for name in OUTPUT_FIELDS])
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        writer: Any = pq.ParquetWriter(str(out_path), schema)
+    else:
+        writer = pa.ipc.new_file(str(out_path), schema)
+
+    n = 0
+    columns: list[list[str]] = [[] for _ in OUTPUT_FIELDS]
+
+    def flush() -> None:
+        if columns[0]:
+            writer.write_table(
+                pa.Table.from_arrays([pa.array(c, pa.string()) for c in columns], schema=schema)
+            )
+            for c in columns:
+                c.clear()
+
+    try:
+        for r in records:
+            for c, v in zip(columns, _row(r)):
+                c.append(v)
+            n += 1
+            if len(columns[0]) >= _ARROW_BATCH_ROWS:
+                flush()
+        flush()
+    finally:
+        writer.close()
+    return n
+
+
+def write_records(
+    out_path: Path,
+    records: Iterable[Any],
+    widths: Optional[Sequence[float]] = None,
+) -> int:
+    # 按 --out 的扩展名选择写出格式；records 只遍历一次，返回写出的行数。
+    suffix = out_path.suffix.lower()
+    if suffix not in OUTPUT_SUFFIXES:
+        raise ValueError(f"不支持的输出格式：{out_path.suffix}（可选：{', '.join(OUTPUT_SUFFIXES)}）")
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    if suffix == ".xlsx":
+        return _write_xlsx(out_path, records, widths or [18, 24, 24, 12])
+    if suffix == ".csv":
+        return _write_csv(out_path, records)
+    if suffix == ".jsonl":
+        return _write_jsonl(out_path, records)
+    return _write_arrow(out_path, records, "parquet" if suffix == ".parquet" else "ipc")
@@ -0,0 +1,489 @@
+from __future__ import annotations
+
+import argparse
+import hmac
+import importlib
+import io
+import json
+import os
+import secrets
+import signal
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from contextlib import redirect_stderr, redirect_stdout
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Optional
+
+from range_check_client import default_token_file
+
+# 常驻任务服务：本机 HTTP（默认 127.0.0.1:8765）接收比对/提取/目录提取任务，交给常驻工作进程执行。
+# 工作进程启动时预先导入各脚本与 openpyxl/pdfplumber，OCR 引擎、表头登记、比对表解析缓存在任务间保持热状态，
+# 单个任务的耗时只剩实际工作。每个工作进程同一时刻只执行一个任务，任务即对应脚本的 main(argv)，
+# 语义与命令行完全一致，标准输出/错误作为任务输出返回。
+# 任务可读写任意路径，所有请求都要带 X-Job-Token：未指定 --token 时随机生成并写入仅本用户可读的令牌文件，
+# 客户端自动读取。浏览器发出的请求（带 Origin 头）与非 application/json 的提交一律拒绝，网页无法借用户浏览器投递任务。
+
+JOB_KINDS = {
+    "compare": "compare_range_check_excel",
+    "extract": "extract_dcs_fields",
+    "folder": "extract_folder_range_check",
+}
+_WARM_MODULES = ("openpyxl", "pdfplumber")
+_MAX_FINISHED_JOBS = 1000
+
+
+def _run_job(kind: str, argv: list[str], cwd: str) -> dict[str, Any]:
+    import profiling
+
+    module = importlib.import_module(JOB_KINDS[kind])
+    out = io.StringIO()
+    exit_code = 0
+    error = ""
+    prev_cwd = os.getcwd()
+    prev_argv = sys.argv
+    # 帮助与参数错误信息中的程序名与直接运行脚本时一致。
+    sys.argv = [os.path.basename(module.__file__ or kind)] + list(argv)
+    t0 = time.perf_counter()
+    try:
+        if cwd:
+            os.chdir(cwd)
+        with redirect_stdout(out), redirect_stderr(out):
+            exit_code = int(module.main(argv) or 0)
+    except SystemExit as e:
+        # argparse 参数错误等；帮助与错误信息已写入 out。
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 2)
+    except Exception as e:
+        exit_code = 2
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        os.chdir(prev_cwd)
+        sys.argv = prev_argv
+        profiling.disable()
+    return {
+        "exit_code": exit_code,
+        "output": out.getvalue(),
+        "error": error,
+        "seconds": round(time.perf_counter() - t0, 6),
+    }
+
+
+def _job_worker_loop(conn: Any, cache_entries: int) -> None:
+    import compare_range_check_excel
+    import extract_dcs_fields  # noqa: F401
+    import extract_folder_range_check
+    from ocr_cache import close_caches
+
+    for name in _WARM_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+    cache = compare_range_check_excel.enable_workbook_cache(cache_entries)
+    extract_folder_range_check.keep_worker_pools()
+    try:
+        while True:
+            try:
+                task = conn.recv()
+            except EOFError:
+                return
+            if task is None:
+                return
+            job_id, kind, argv, cwd = task
+            result = _run_job(kind, argv, cwd)
+            result["workbook_cache"] = cache.stats()
+            conn.send((job_id, result))
+    finally:
+        extract_folder_range_check.close_worker_pools()
+        close_caches()
+
+
+class _JobWorker:
+    # 一个常驻工作进程；进程退出或任务超时时终止并补一个新进程（缓存随之丢失）。
+    # 非守护进程：目录提取任务在其中还要创建自己的多进程池。
+    def __init__(self, ctx: Any, cache_entries: int) -> None:
+        self._ctx = ctx
+        self._cache_entries = cache_entries
+        self.restarts = 0
+        self.jobs_done = 0
+        self.workbook_cache: dict[str, int] = {}
+        self._start()
+
+    def _start(self) -> None:
+        parent_conn, child_conn = self._ctx.Pipe()
+        self._proc = self._ctx.Process(
+            target=_job_worker_loop,
+            args=(child_conn, self._cache_entries),
+            name="range-check-job",
+        )
+        self._proc.start()
+        child_conn.close()
+        self._conn = parent_conn
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._proc.pid
+
+    def _restart(self) -> None:
+        if self._proc.is_alive():
+            self._proc.terminate()
+        self._proc.join(5)
+        self._conn.close()
+        self._start()
+        self.restarts += 1
+        self.workbook_cache = {}
+
+    def run(self, job: "Job", timeout: float) -> dict[str, Any]:
+        started = time.monotonic()
+        try:
+            self._conn.send((job.id, job.kind, job.argv, job.cwd))
+            while True:
+                wait_for = 0.5
+                if timeout > 0:
+                    wait_for = max(0.0, min(wait_for, started + timeout - time.monotonic()))
+                if self._conn.poll(wait_for):
+                    _, result = self._conn.recv()
+                    self.jobs_done += 1
+                    self.workbook_cache = result.pop("workbook_cache", {})
+                    return result
+                if not self._proc.is_alive():
+                    raise EOFError
+                if timeout > 0 and time.monotonic() - started >= timeout:
+                    self._restart()
+                    return {"exit_code": 2, "output": "", "error": f"超过 {timeout:g}s，已终止", "seconds": timeout}
+        except (EOFError, OSError):
+            self._restart()
+            return {"exit_code": 2, "output": "", "error": "工作进程异常退出", "seconds": time.monotonic() - started}
+
+    def close(self) -> None:
+        try:
+            self._conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self._proc.join(10)
+        if self._proc.is_alive():
+            self._proc.terminate()
+            self._proc.join(1)
+        self._conn.close()
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    argv: list[str]
+    cwd: str
+    affinity: Optional[int]
+    submitted: float = field(default_factory=time.time)
+    status: str = "queued"
+    worker: Optional[int] = None
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    result: Optional[dict[str, Any]] = None
+    done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def to_dict(self) -> dict[str, Any]:
+        d: dict[str, Any] = {
+            "id": self.id,
+            "kind": self.kind,
+            "argv": self.argv,
+            "status": self.status,
+            "worker": self.worker,
+            "queued_seconds": round((self.started or time.time()) - self.submitted, 6),
+        }
+        if self.result is not None:
+            d.update(self.result)
+        return d
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _compare_affinity(argv: list[str], workers: int) -> Optional[int]:
+    # 同一组比对文件的任务尽量交给同一个工作进程，命中其已解析的比对表缓存；该进程忙时仍可由其它进程执行。
+    paths: list[str] = []
+    taking = False
+    for a in argv:
+        if a == "--compare":
+            taking = True
+        elif a.startswith("--"):
+            taking = False
+        elif taking:
+            paths.append(os.path.normcase(os.path.abspath(a)))
+    if not paths:
+        return None
+    return zlib.crc32("\n".join(sorted(paths)).encode("utf-8")) % workers
+
+
+class JobService:
+    # 任务队列：排队任务超过 max_queue 时拒绝提交；每类任务有并发上限（目录提取默认 1，避免多个 OCR 任务互相争抢）。
+    # 每个工作进程一个调度线程，空闲时优先取与自己有亲和性的任务，其次取最早的可运行任务。
+    def __init__(
+        self,
+        workers: int,
+        max_queue: int,
+        limits: dict[str, int],
+        job_timeout: float,
+        cache_entries: int,
+    ) -> None:
+        import multiprocessing as mp
+
+        ctx = mp.get_context("spawn")
+        self._max_queue = max(1, max_queue)
+        self._limits = {k: max(1, limits.get(k, workers)) for k in JOB_KINDS}
+        self._timeout = job_timeout
+        self._cond = threading.Condition()
+        self._pending: list[Job] = []
+        self._running = {k: 0 for k in JOB_KINDS}
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._closed = False
+        self._workers = [_JobWorker(ctx, cache_entries) for _ in range(max(1, workers))]
+        self._threads = [
+            threading.Thread(target=self._serve_slot, args=(i,), name=f"job-slot-{i}", daemon=True)
+            for i in range(len(self._workers))
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, kind: str, argv: list[str], cwd: str) -> Job:
+        affinity = _compare_affinity(argv, len(self._workers)) if kind == "compare" else None
+        job = Job(uuid.uuid4().hex[:12], kind, list(argv), cwd, affinity)
+        with self._cond:
+            if len(self._pending) >= self._max_queue:
+                raise QueueFull(f"排队任务已达上限 {self._max_queue}")
+            self._pending.append(job)
+            self._jobs[job.id] = job
+            finished = [j for j in self._jobs.values() if j.done.is_set()]
+            for old in finished[: max(0, len(finished) - _MAX_FINISHED_JOBS)]:
+                del self._jobs[old.id]
+            self._cond.notify_all()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def status(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "pending": len(self._pending),
+                "running": dict(self._running),
+                "limits": dict(self._limits),
+                "max_queue": self._max_queue,
+                "workers": [
+                    {
+                        "pid": w.pid,
+                        "jobs_done": w.jobs_done,
+                        "restarts": w.restarts,
+                        "workbook_cache": w.workbook_cache,
+                    }
+                    for w in self._workers
+                ],
+            }
+
+    def _take(self, slot: int) -> Optional[Job]:
+        runnable = [j for j in self._pending if self._running[j.kind] < self._limits[j.kind]]
+        if not runnable:
+            return None
+        job = next((j for j in runnable if j.affinity == slot), runnable[0])
+        self._pending.remove(job)
+        return job
+
+    def _serve_slot(self, slot: int) -> None:
+        worker = self._workers[slot]
+        while True:
+            with self._cond:
+                job = None
+                while not self._closed:
+                    job = self._take(slot)
+                    if job is not None:
+                        break
+                    self._cond.wait()
+                if job is None:
+                    return
+                self._running[job.kind] += 1
+                job.status = "running"
+                job.worker = slot
+                job.started = time.time()
+            result = worker.run(job, self._timeout)
+            with self._cond:
+                self._running[job.kind] -= 1
+                job.result = result
+                job.status = "done" if result["exit_code"] == 0 and not result["error"] else "failed"
+                job.finished = time.time()
+                self._cond.notify_all()
+            job.done.set()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            for job in self._pending:
+                job.status = "cancelled"
+                job.done.set()
+            self._pending.clear()
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join()
+        for w in self._workers:
+            w.close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_Server"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _reply(self, code: int, body: dict[str, Any]) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorized(self) -> bool:
+        if self.headers.get("Origin") is not None:
+            self._reply(403, {"error": "不接受浏览器跨源请求"})
+            return False
+        token = self.headers.get("X-Job-Token") or ""
+        if not hmac.compare_digest(token.encode("utf-8"), self.server.token.encode("utf-8")):
+            self._reply(403, {"error": "token 不正确"})
+            return False
+        return True
+
+    def do_GET(self) -> None:
+        if not self._authorized():
+            return
+        service = self.server.service
+        if self.path == "/status":
+            self._reply(200, service.status())
+            return
+        if self.path.startswith("/jobs/"):
+            job = service.get(self.path[len("/jobs/") :])
+            if job is None:
+                self._reply(404, {"error": "任务不存在"})
+            else:
+                self._reply(200, job.to_dict())
+            return
+        self._reply(404, {"error": "未知路径"})
+
+    def do_POST(self) -> None:
+        if not self._authorized():
+            return
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            self._reply(415, {"error": "请求体必须是 application/json"})
+            return
+        if self.path != "/jobs":
+            self._reply(404, {"error": "未知路径"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            req = json.loads(self.rfile.read(length).decode("utf-8"))
+            kind = req["kind"]
+            argv = req.get("argv", [])
+            if kind not in JOB_KINDS:
+                raise ValueError(f"未知任务类型：{kind}（可选：{', '.join(JOB_KINDS)}）")
+            if not isinstance(argv, list) or not all(isinstance(a, str) for a in argv):
+                raise ValueError("argv 必须是字符串列表")
+            if kind == "folder" and "--watch" in argv:
+                raise ValueError("服务模式不支持 --watch")
+        except (ValueError, KeyError, TypeError) as e:
+            self._reply(400, {"error": str(e)})
+            return
+        try:
+            job = self.server.service.submit(kind, argv, str(req.get("cwd") or ""))
+        except QueueFull as e:
+            self._reply(503, {"error": str(e)})
+            return
+        if not req.get("wait", True):
+            self._reply(202, job.to_dict())
+            return
+        job.done.wait()
+        self._reply(200, job.to_dict())
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], service: JobService, token: str, verbose: bool) -> None:
+        super().__init__(address, _Handler)
+        self.service = service
+        self.token = token
+        self.verbose = verbose
+
+
+def _write_token_file(path: Path, token: str) -> None:
+    # 以 0600 新建后再写入，其他用户在任何时刻都读不到令牌（Windows 上依赖用户主目录的 ACL）。
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.unlink(missing_ok=True)
+    fd = os.open(str(path), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="常驻任务服务：以本机 HTTP 接收比对/提取任务，由热工作进程执行。")
+    ap.add_argument("--host", default="127.0.0.1", help="监听地址（默认仅本机）")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--workers", type=int, default=2, help="常驻工作进程数（同时执行的任务数上限）")
+    ap.add_argument("--max-queue", type=int, default=64, help="排队任务数上限，超出时返回 503")
+    ap.add_argument("--max-compare", type=int, default=0, help="同时执行的比对任务上限（默认：工作进程数）")
+    ap.add_argument("--max-extract", type=int, default=0, help="同时执行的 DCS 提取任务上限（默认：工作进程数）")
+    ap.add_argument("--max-folder", type=int, default=1, help="同时执行的目录提取任务上限")
+    ap.add_argument("--job-timeout", type=float, default=0.0, help="单个任务的墙钟超时秒数，超时终止并替换工作进程（0=不限）")
+    ap.add_argument("--cache-entries", type=int, default=16, help="每个工作进程缓存的已解析比对表数量")
+    ap.add_argument(
+        "--token",
+        default=os.environ.get("RANGE_CHECK_TOKEN", ""),
+        help="要求请求头 X-Job-Token 与之相同（默认：随机生成并写入 --token-file）",
+    )
+    ap.add_argument("--token-file", default="", help="令牌文件路径（默认：用户主目录下 .range_check_server_<端口>.token）")
+    ap.add_argument("--verbose", action="store_true", help="打印每个 HTTP 请求")
+    args = ap.parse_args(argv)
+
+    workers = max(1, args.workers)
+    limits = {
+        "compare": args.max_compare or workers,
+        "extract": args.max_extract or workers,
+        "folder": args.max_folder,
+    }
+    token = args.token
+    token_file: Optional[Path] = None
+    if not token:
+        token = secrets.token_urlsafe(32)
+        token_file = Path(args.token_file) if args.token_file else default_token_file(args.port)
+        _write_token_file(token_file, token)
+    service = JobService(workers, args.max_queue, limits, args.job_timeout, args.cache_entries)
+    try:
+        server = _Server((args.host, args.port), service, token, args.verbose)
+    except OSError:
+        service.close()
+        raise
+    # 服务管理器以 SIGTERM 停止服务时同样走 finally，关闭工作进程及其下属进程池。
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    print(f"listening=http://{args.host}:{server.server_address[1]} workers={workers}", flush=True)
+    if token_file is not None:
+        print(f"token_file={token_file}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if token_file is not None:
+            token_file.unlink(missing_ok=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
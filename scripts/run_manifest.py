@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from ocr_cache import file_sha256
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    name: str
+    size: int
+    mtime_ns: int
+    sha256: str
+    params: str
+    records: list[list[str]]
+    stats: dict[str, Any]
+
+
+def file_stat(path: Path) -> tuple[int, int]:
+    st = path.stat()
+    return st.st_size, st.st_mtime_ns
+
+
+def params_signature(params: dict[str, Any]) -> str:
+    return json.dumps(params, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+class RunManifest:
+    # 目录增量运行的清单：每个已成功处理的 PDF 记录 (大小, mtime, 内容哈希, 提取参数, 记录, 统计)。
+    # 每处理完一个文件立即提交，运行中断后重跑会跳过已完成的文件；SQLite 单文件（WAL）。
+    def __init__(self, db_path: Path) -> None:
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), timeout=30.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " name TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " sha256 TEXT NOT NULL,"
+            " params TEXT NOT NULL,"
+            " records BLOB NOT NULL,"
+            " stats TEXT NOT NULL,"
+            " updated REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _load(self, name: str) -> Optional[ManifestEntry]:
+        row = self._conn.execute(
+            "SELECT size, mtime_ns, sha256, params, records, stats FROM files WHERE name = ?",
+            (name,),
+        ).fetchone()
+        if row is None:
+            return None
+        size, mtime_ns, sha256, params, records, stats = row
+        return ManifestEntry(
+            name=name,
+            size=int(size),
+            mtime_ns=int(mtime_ns),
+            sha256=str(sha256),
+            params=str(params),
+            records=json.loads(zlib.decompress(records).decode("utf-8")),
+            stats=json.loads(stats),
+        )
+
+    def lookup(self, pdf_path: Path, params: str) -> Optional[ManifestEntry]:
+        # 大小与 mtime 都未变视为未修改，不再计算哈希；只有 mtime 变了（复制、touch）时才比对内容哈希，
+        # 内容相同则刷新 mtime 后继续复用。提取参数不同的记录一律视为过期。
+        with self._lock:
+            entry = self._load(pdf_path.name)
+            if entry is None or entry.params != params:
+                return None
+            st = pdf_path.stat()
+            if entry.size != st.st_size:
+                return None
+            if entry.mtime_ns == st.st_mtime_ns:
+                return entry
+            if file_sha256(pdf_path) != entry.sha256:
+                return None
+            self._conn.execute(
+                "UPDATE files SET mtime_ns = ? WHERE name = ?",
+                (st.st_mtime_ns, pdf_path.name),
+            )
+            self._conn.commit()
+            return entry
+
+    def store(
+        self,
+        pdf_path: Path,
+        seen: tuple[int, int],
+        params: str,
+        records: Iterable[Iterable[str]],
+        stats: dict[str, Any],
+    ) -> bool:
+        # seen 为处理开始前的 (大小, mtime)；处理期间文件被改写则不登记，下次运行会重新处理。
+        size, mtime_ns = file_stat(pdf_path)
+        if (size, mtime_ns) != seen:
+            return False
+        sha256 = file_sha256(pdf_path)
+        blob = zlib.compress(
+            json.dumps([list(r) for r in records], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        )
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files(name, size, mtime_ns, sha256, params, records, stats, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    pdf_path.name,
+                    size,
+                    mtime_ns,
+                    sha256,
+                    params,
+                    blob,
+                    json.dumps(stats, ensure_ascii=False),
+                    time.time(),
+                ),
+            )
+            self._conn.commit()
+        return True
+
+    def prune(self, keep_names: Iterable[str]) -> int:
+        # 删除清单中已不在本次文件列表里的条目（文件被删除或被同名优先规则替换），返回删除数。
+        keep = set(keep_names)
+        with self._lock:
+            names = [n for (n,) in self._conn.execute("SELECT name FROM files") if n not in keep]
+            self._conn.executemany("DELETE FROM files WHERE name = ?", [(n,) for n in names])
+            self._conn.commit()
+        return len(names)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+
+# OCR 常见的形近字符统一折叠为数字，连字符/下划线整体去掉；折叠后相同的位号视为距离 0 的候选。
+_CONFUSABLE = str.maketrans({"O": "0", "I": "1", "S": "5"})
+_SEPARATORS = re.compile(r"[-_]")
+
+
+def fold_tag(tag: str) -> str:
+    return _SEPARATORS.sub("", tag.upper()).translate(_CONFUSABLE)
+
+
+def edit_distance(a: str, b: str, limit: Optional[int] = None) -> int:
+    # Levenshtein 距离；先去掉公共前后缀，给出 limit 时只计算宽 2 * limit + 1 的对角带，超过即返回 limit + 1。
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+
+    start = 0
+    n = len(b)
+    while start < n and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), n
+    while end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a = a[start:end_a]
+    b = b[start:end_b]
+    if not b:
+        return len(a) if limit is None or len(a) <= limit else limit + 1
+
+    la, lb = len(a), len(b)
+    band = la if limit is None else limit
+    big = la + lb + 1
+    prev = [j if j <= band else big for j in range(lb + 1)]
+    for i in range(1, la + 1):
+        lo = max(1, i - band)
+        hi = min(lb, i + band)
+        cur = [big] * (lb + 1)
+        if i <= band:
+            cur[0] = i
+        ca = a[i - 1]
+        best = cur[0] if lo == 1 else big
+        for j in range(lo, hi + 1):
+            v = prev[j - 1] + (ca != b[j - 1])
+            if prev[j] + 1 < v:
+                v = prev[j] + 1
+            if cur[j - 1] + 1 < v:
+                v = cur[j - 1] + 1
+            cur[j] = v
+            if v < best:
+                best = v
+        if limit is not None and best > limit:
+            return limit + 1
+        prev = cur
+    d = prev[lb]
+    if limit is not None and d > limit:
+        return limit + 1
+    return d
+
+
+def _segments(length: int, k: int) -> Iterator[tuple[int, int, int]]:
+    # 把长度为 length 的串均分为 k + 1 段，返回 (段序号, 起点, 段长)；短段在前。
+    n = k + 1
+    base, extra = divmod(length, n)
+    pos = 0
+    for i in range(n):
+        seg_len = base + (1 if i >= n - extra else 0)
+        yield i, pos, seg_len
+        pos += seg_len
+
+
+@dataclass(frozen=True)
+class TagMatch:
+    tag: str
+    distance: int  # 原位号之间的编辑距离（形近字符与连字符也按实际差异计数）
+    folded_distance: int  # 折叠后的编辑距离，用于判定是否在 max_dist 之内
+
+
+class TagIndex:
+    # 有界编辑距离的位号索引（分段鸽巢过滤）：折叠后的位号分成 max_dist + 1 段，
+    # 距离不超过 max_dist 的两串必有一段原样出现在查询串中、且位置偏移不超过 max_dist；
+    # 按 (长度, 段序号, 段内容) 建倒排表，查询只需 O(max_dist^3) 次哈希查找，再对少量候选做带状 Levenshtein 校验。
+    def __init__(self, tags: Iterable[str], max_dist: int = 1) -> None:
+        if max_dist < 0:
+            raise ValueError("max_dist 不能为负数。")
+        self.max_dist = max_dist
+        self._keys: list[str] = []
+        self._tags_by_key: list[list[tuple[int, str]]] = []
+        key_ids: dict[str, int] = {}
+        for order, tag in enumerate(tags):
+            key = fold_tag(tag)
+            kid = key_ids.get(key)
+            if kid is None:
+                kid = len(self._keys)
+                key_ids[key] = kid
+                self._keys.append(key)
+                self._tags_by_key.append([])
+            self._tags_by_key[kid].append((order, tag))
+
+        self._postings: dict[tuple[int, int, str], list[int]] = {}
+        self._short: dict[int, list[int]] = {}
+        for kid, key in enumerate(self._keys):
+            if len(key) <= max_dist:
+                self._short.setdefault(len(key), []).append(kid)
+                continue
+            for i, pos, seg_len in _segments(len(key), max_dist):
+                self._postings.setdefault((len(key), i, key[pos : pos + seg_len]), []).append(kid)
+
+    def __len__(self) -> int:
+        return sum(len(tags) for tags in self._tags_by_key)
+
+    def _candidates(self, key: str) -> set[int]:
+        k = self.max_dist
+        n = len(key)
+        out: set[int] = set()
+        for length in range(max(0, n - k), n + k + 1):
+            if length <= k:
+                out.update(self._short.get(length, ()))
+                continue
+            delta = n - length
+            for i, pos, seg_len in _segments(length, k):
+                # 第 i 段之前最多 i 次编辑、之后最多 k - i 次编辑，据此收窄该段在查询串中的起点范围。
+                lo = max(0, pos - i, pos + delta - (k - i))
+                hi = min(n - seg_len, pos + i, pos + delta + (k - i))
+                for start in range(lo, hi + 1):
+                    ids = self._postings.get((length, i, key[start : start + seg_len]))
+                    if ids:
+                        out.update(ids)
+        return out
+
+    def search(self, tag: str) -> list[TagMatch]:
+        # 返回折叠后距离不超过 max_dist 的全部位号，按 (折叠距离, 原始距离, 建索引顺序) 排序。
+        key = fold_tag(tag)
+        hits: list[tuple[int, int, int, TagMatch]] = []
+        for kid in self._candidates(key):
+            folded = edit_distance(key, self._keys[kid], self.max_dist)
+            if folded > self.max_dist:
+                continue
+            for order, cand in self._tags_by_key[kid]:
+                raw = edit_distance(tag, cand)
+                hits.append((folded, raw, order, TagMatch(cand, raw, folded)))
+        hits.sort(key=lambda h: h[:3])
+        return [h[3] for h in hits]
+
+    def best(self, tag: str) -> Optional[TagMatch]:
+        matches = self.search(tag)
+        return matches[0] if matches else None